@@ -0,0 +1,290 @@
+import os
+import numpy as np
+from common.embedding_store import as_float
+
+# Índice persistente de los embeddings CFMS
+ANN_INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "output", "indice_ann.npz"))
+
+
+def _normalizar(x):
+    x = np.atleast_2d(as_float(x)).astype(np.float32, copy=False)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-10)
+
+
+class ANNIndex:
+    """
+    Índice aproximado de vecinos (IVF-Flat) sobre embeddings normalizados,
+    solo con NumPy: la similitud coseno es el producto punto.
+
+    - build: k-means esférico sobre una muestra define n_lists centroides;
+      cada vector va a la lista de su centroide más cercano.
+    - query: compara la consulta con los centroides, revisa solo las
+      n_probe listas más cercanas y devuelve los k mejores candidatos.
+      Costo ≈ n_lists + n_probe · n / n_lists productos punto por consulta.
+    - add: agrega vectores nuevos a las listas existentes sin re-entrenar.
+      Vectores, ids y listas viven en buffers con capacidad de reserva
+      (se duplican al llenarse) y cada lista invertida es su propio array
+      de posiciones: agregar m vectores cuesta O(m) más el tamaño de las
+      listas que tocan, no O(n).
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, seed=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+
+        self.centroides = None
+        self._n = 0
+        self._vectores = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=object)
+        self._listas = np.zeros(0, dtype=np.int32)
+
+        # Listas invertidas: posiciones de los vectores de cada centroide
+        self._miembros = []
+
+    def __len__(self):
+        return self._n
+
+    # Vistas de las filas ocupadas de los buffers
+    @property
+    def vectores(self):
+        return self._vectores[:self._n]
+
+    @property
+    def ids(self):
+        return self._ids[:self._n]
+
+    @property
+    def listas(self):
+        return self._listas[:self._n]
+
+    # ----------------------------------------
+    # Construcción
+    # ----------------------------------------
+    def _kmeans(self, x, n_lists, iteraciones=20):
+        rng = np.random.default_rng(self.seed)
+        centroides = x[rng.choice(len(x), n_lists, replace=False)].copy()
+
+        for _ in range(iteraciones):
+            asignacion = np.argmax(x @ centroides.T, axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, x)
+            vacias = np.bincount(asignacion, minlength=n_lists) == 0
+            # Las listas vacías se re-siembran con puntos al azar
+            sumas[vacias] = x[rng.choice(len(x), int(vacias.sum()))]
+            centroides = _normalizar(sumas)
+
+        return centroides
+
+    def _asignar(self, x, bloque=8192):
+        return np.concatenate([
+            np.argmax(x[i:i + bloque] @ self.centroides.T, axis=1)
+            for i in range(0, len(x), bloque)
+        ]).astype(np.int32) if len(x) else np.zeros(0, dtype=np.int32)
+
+    def _reindexar(self):
+        orden = np.argsort(self.listas, kind="stable")
+        conteos = np.bincount(self.listas, minlength=len(self.centroides))
+        self._miembros = np.split(orden, np.cumsum(conteos)[:-1])
+
+    def _reservar(self, n):
+        """Asegura capacidad para n vectores (duplicando los buffers)."""
+        if n <= len(self._vectores):
+            return
+        capacidad = max(n, 2 * len(self._vectores), 1024)
+        dim = self._vectores.shape[1]
+
+        vectores = np.empty((capacidad, dim), dtype=np.float32)
+        vectores[:self._n] = self.vectores
+        ids = np.empty(capacidad, dtype=object)
+        ids[:self._n] = self.ids
+        listas = np.empty(capacidad, dtype=np.int32)
+        listas[:self._n] = self.listas
+        self._vectores, self._ids, self._listas = vectores, ids, listas
+
+    def _cargar_arrays(self, vectores, ids, listas):
+        self._n = len(vectores)
+        self._vectores = vectores
+        self._ids = np.asarray(list(ids), dtype=object)
+        self._listas = np.asarray(listas, dtype=np.int32)
+        self._reindexar()
+
+    def build(self, embeddings, ids=None, muestra_max=100_000):
+        x = _normalizar(embeddings)
+        n = len(x)
+        if ids is None:
+            ids = np.arange(n)
+
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(self.seed)
+        entrenamiento = x if n <= muestra_max else x[rng.choice(n, muestra_max, replace=False)]
+
+        self.centroides = self._kmeans(entrenamiento, n_lists)
+        self._cargar_arrays(x, ids, self._asignar(x))
+        return self
+
+    def add(self, embeddings, ids):
+        """Agrega vectores a las listas existentes (sin re-entrenar centroides)."""
+        if self.centroides is None:
+            return self.build(embeddings, ids)
+
+        x = _normalizar(embeddings)
+        ids = list(ids)
+        if len(ids) != len(x):
+            raise ValueError("embeddings e ids deben tener la misma longitud")
+
+        inicio, fin = self._n, self._n + len(x)
+        self._reservar(fin)
+        listas = self._asignar(x)
+        self._vectores[inicio:fin] = x
+        self._ids[inicio:fin] = ids
+        self._listas[inicio:fin] = listas
+        self._n = fin
+
+        # Solo se tocan las listas que reciben vectores
+        posiciones = np.arange(inicio, fin)
+        for l in np.unique(listas):
+            self._miembros[l] = np.concatenate([self._miembros[l], posiciones[listas == l]])
+        return self
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    @staticmethod
+    def _embeber_textos(textos):
+        from agente_cfms.embeddings.semantic_extractor import EMBEDDING_MODEL
+        from agente_cfms.normalizer.normalizer import normalize_text
+        from common.model_registry import get_embedding_model
+
+        return get_embedding_model(EMBEDDING_MODEL).encode(
+            [normalize_text(t) for t in textos],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+
+    def _buscar_posiciones(self, consultas, k, n_probe):
+        """Posiciones internas y similitudes de los k vecinos de cada consulta."""
+        n_probe = min(n_probe or self.n_probe, len(self.centroides))
+        cercanas = np.argpartition(-(consultas @ self.centroides.T), n_probe - 1, axis=1)[:, :n_probe]
+
+        resultados = []
+        for q, listas in zip(consultas, cercanas):
+            candidatos = np.concatenate([self._miembros[l] for l in listas])
+            sims = self.vectores[candidatos] @ q
+
+            top = min(k, len(candidatos))
+            mejores = np.argpartition(-sims, top - 1)[:top] if top else np.zeros(0, dtype=int)
+            mejores = mejores[np.argsort(-sims[mejores])]
+            resultados.append((candidatos[mejores], sims[mejores]))
+
+        return resultados
+
+    def query(self, vector_or_text, k=10, n_probe=None):
+        """
+        Vecinos aproximados de un vector, de un texto o de una lista de
+        ellos. Para una sola consulta devuelve [(id_articulo, similitud)];
+        para varias, una lista así por consulta.
+        """
+        if isinstance(vector_or_text, str):
+            unica, consultas = True, self._embeber_textos([vector_or_text])
+        elif isinstance(vector_or_text, (list, tuple)) and vector_or_text and isinstance(vector_or_text[0], str):
+            unica, consultas = False, self._embeber_textos(list(vector_or_text))
+        else:
+            # Un vector suelto (1-D) es una consulta; una matriz, una por fila
+            unica, consultas = np.ndim(vector_or_text) == 1, vector_or_text
+
+        resultados = [
+            list(zip(self.ids[pos].tolist(), sims.tolist()))
+            for pos, sims in self._buscar_posiciones(_normalizar(consultas), k, n_probe)
+        ]
+        return resultados[0] if unica else resultados
+
+    def _vecinos_filas(self, desde, k, umbral, n_probe, bloque):
+        """(filas, cols, sims) de los k vecinos de cada vector desde la posición `desde`."""
+        n = len(self.vectores)
+        filas, cols, vals = [], [], []
+
+        for i in range(desde, n, bloque):
+            for fila, (pos, sims) in enumerate(
+                self._buscar_posiciones(self.vectores[i:i + bloque], k + 1, n_probe), start=i
+            ):
+                mask = pos != fila
+                if umbral is not None:
+                    mask &= sims >= umbral
+                pos, sims = pos[mask][:k], sims[mask][:k]
+                filas.append(np.full(len(pos), fila))
+                cols.append(pos)
+                vals.append(sims)
+
+        if not filas:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32)
+        return np.concatenate(filas), np.concatenate(cols), np.concatenate(vals)
+
+    def knn_graph(self, k=10, umbral=None, n_probe=None, bloque=1024):
+        """
+        Matriz dispersa (CSR, n × n) con los k vecinos aproximados de cada
+        vector indexado, en el mismo formato que similitud_dispersa:
+        sirve directamente para construir_grafo sin el costo cuadrático.
+        Las filas siguen el orden en que se indexaron los vectores.
+        """
+        from scipy import sparse
+
+        n = len(self.vectores)
+        filas, cols, vals = self._vecinos_filas(0, k, umbral, n_probe, bloque)
+
+        return sparse.csr_matrix(
+            (vals, (filas, cols)),
+            shape=(n, n),
+            dtype=np.float32,
+        )
+
+    def pares_desde(self, desde, k=10, umbral=None, n_probe=None, bloque=1024):
+        """
+        Aristas (i, j, sim) con i < j entre cada vector indexado desde la
+        posición `desde` (p. ej. los recién agregados con add) y sus k
+        vecinos aproximados. Es el vecindario que cambia al agregar
+        artículos; el costo depende solo de cuántos son.
+        """
+        filas, cols, vals = self._vecinos_filas(desde, k, umbral, n_probe, bloque)
+
+        i, j = np.minimum(filas, cols), np.maximum(filas, cols)
+        # Dos artículos nuevos vecinos entre sí aparecen dos veces
+        _, unicos = np.unique(i * len(self.vectores) + j, return_index=True)
+        return i[unicos], j[unicos], vals[unicos]
+
+    # ----------------------------------------
+    # Persistencia
+    # ----------------------------------------
+    def _ids_para_guardar(self):
+        """
+        ids con dtype fijo, legibles con allow_pickle=False: enteros como
+        int64; cualquier otra combinación (texto, None, mixtos) como texto.
+        """
+        ids = self.ids.tolist()
+        if all(isinstance(i, (int, np.integer)) and not isinstance(i, bool) for i in ids):
+            return np.asarray(ids, dtype=np.int64)
+        return np.asarray([str(i) for i in ids], dtype=str)
+
+    def save(self, path=ANN_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(
+            path,
+            centroides=self.centroides,
+            vectores=self.vectores,
+            ids=self._ids_para_guardar(),
+            listas=self.listas,
+            parametros=np.array([self.n_probe, self.seed]),
+        )
+        print(f"[OK] Índice ANN guardado en: {path} ({len(self)} vectores, {len(self.centroides)} listas)")
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        datos = np.load(path, allow_pickle=False)
+        n_probe, seed = datos["parametros"].tolist()
+
+        indice = cls(n_lists=len(datos["centroides"]), n_probe=n_probe, seed=seed)
+        indice.centroides = datos["centroides"]
+        indice._cargar_arrays(datos["vectores"], datos["ids"].tolist(), datos["listas"])
+        return indice
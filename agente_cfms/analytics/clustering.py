@@ -1,21 +1,191 @@
+import os
+import hashlib
 import hdbscan
 import numpy as np
+from common.embedding_store import as_float, hash_por_bloques
 
-def clusterizar(embeddings, min_cluster_size=3, min_samples=1):
+# Caché en disco de las reducciones de dimensión (PCA / UMAP)
+REDUCCION_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "output", "cache_reduccion"))
+
+# Dimensiones por defecto de la reducción previa al clustering
+REDUCCION_DIMENSIONES = 32
+
+REDUCCIONES = ("pca", "umap")
+
+
+# ============================================
+# REDUCCIÓN DE DIMENSIÓN (con caché)
+# ============================================
+def reducir(embeddings, metodo="pca", n_componentes=REDUCCION_DIMENSIONES, seed=42, cache_dir=REDUCCION_CACHE_DIR):
     """
-    Clustering para embeddings semánticos usando HDBSCAN.
-    - No requiere elegir k.
-    - Detecta outliers.
-    - Produce clusters coherentes para taxonomía.
+    Proyecta los embeddings a n_componentes dimensiones con PCA o UMAP.
+    El resultado se guarda en cache_dir con una clave que depende del
+    contenido de los embeddings, el método, las dimensiones y la semilla:
+    volver a clusterizar los mismos embeddings no repite la reducción.
+
+    Con pocos artículos las dimensiones se limitan a n_muestras - 1 en PCA
+    y n_muestras - 2 en UMAP (su inicialización espectral no admite más);
+    si no queda nada que reducir, se devuelven los embeddings sin cambios.
+    """
+    if metodo not in REDUCCIONES:
+        raise ValueError(f"Reducción no soportada: {metodo}. Opciones: {REDUCCIONES}")
+
+    n, dim = np.shape(embeddings)
+    n_componentes = min(n_componentes, n - (1 if metodo == "pca" else 2))
+    if n_componentes < 1 or n_componentes >= dim:
+        return np.ascontiguousarray(as_float(embeddings), dtype=np.float32)
+
+    # La clave se calcula por bloques: con un acierto de caché la matriz
+    # (p. ej. el memmap del EmbeddingStore) nunca se copia completa
+    h = hash_por_bloques(hashlib.sha256(), embeddings, dtype=np.float32)
+    h.update(f"|{(n, dim)}|{metodo}|{n_componentes}|{seed}".encode("utf-8"))
+    path = os.path.join(cache_dir, f"{h.hexdigest()[:32]}.npy") if cache_dir else None
+
+    if path and os.path.exists(path):
+        print(f"[CACHE] Reducción {metodo} ({n_componentes}D) reutilizada: {path}")
+        return np.load(path)
+
+    x = np.ascontiguousarray(as_float(embeddings), dtype=np.float32)
+
+    if metodo == "pca":
+        from sklearn.decomposition import PCA
+
+        reducidos = PCA(n_components=n_componentes, random_state=seed).fit_transform(x)
+    else:
+        import umap
+
+        # Parámetros orientados a clustering: vecindarios compactos
+        reducidos = umap.UMAP(
+            n_components=n_componentes,
+            n_neighbors=min(15, n - 1),
+            min_dist=0.0,
+            metric="cosine",
+            random_state=seed,
+        ).fit_transform(x)
+
+    reducidos = reducidos.astype(np.float32)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, reducidos)
+        os.replace(tmp, path)
+    return reducidos
+
+
+# ============================================
+# HDBSCAN
+# ============================================
+def ajustar_clusterer(
+    embeddings,
+    min_cluster_size=3,
+    min_samples=1,
+    prediction_data=False,
+    algoritmo="best",
+    n_jobs=4,
+):
+    """
+    Ajusta HDBSCAN y devuelve el clusterer (etiquetas en .labels_).
+    Con prediction_data=True guarda lo necesario para asignar artículos
+    nuevos con asignar_clusters sin volver a ajustar.
+
+    algoritmo: "best", "generic", "prims_kdtree", "prims_balltree",
+    "boruvka_kdtree" o "boruvka_balltree" (ver hdbscan.HDBSCAN). Con
+    "best" y más de 60 dimensiones hdbscan usa prims_kdtree, que corre en
+    un solo hilo; las variantes boruvka reparten las distancias core en
+    n_jobs procesos (4, el valor por defecto de hdbscan; -1 = todos los
+    núcleos).
     """
     clusterer = hdbscan.HDBSCAN(
         metric='euclidean',
         min_cluster_size=min_cluster_size,
         min_samples=min_samples,
-        cluster_selection_method='eom'
+        cluster_selection_method='eom',
+        prediction_data=prediction_data,
+        algorithm=algoritmo,
+        core_dist_n_jobs=n_jobs,
     )
+    clusterer.fit(as_float(embeddings))
+    return clusterer
+
+
+def clusterizar(
+    embeddings,
+    min_cluster_size=3,
+    min_samples=1,
+    reduccion=None,
+    n_componentes=REDUCCION_DIMENSIONES,
+    algoritmo="best",
+    n_jobs=4,
+    cache_dir=REDUCCION_CACHE_DIR,
+):
+    """
+    Clustering para embeddings semánticos usando HDBSCAN.
+    - No requiere elegir k.
+    - Detecta outliers.
+    - Produce clusters coherentes para taxonomía.
+    - Acepta el memmap del EmbeddingStore directamente.
+
+    Para corpus grandes: reduccion="pca" o "umap" proyecta antes a
+    n_componentes dimensiones (resultado en caché en cache_dir; None =
+    sin caché), con lo que "best"
+    pasa a boruvka_kdtree y las distancias core se calculan en n_jobs
+    procesos; algoritmo permite fijar el árbol explícitamente.
+    """
+    if reduccion is not None:
+        embeddings = reducir(embeddings, reduccion, n_componentes, cache_dir=cache_dir)
+
+    return ajustar_clusterer(
+        embeddings, min_cluster_size, min_samples, algoritmo=algoritmo, n_jobs=n_jobs
+    ).labels_
+
+
+# ============================================
+# ASIGNACIÓN DE ARTÍCULOS NUEVOS (modo incremental)
+# ============================================
+def centroides_clusters(embeddings, etiquetas):
+    """
+    (ids de cluster, centroides normalizados) de los clusters no-ruido.
+    """
+    embeddings = as_float(embeddings)
+    etiquetas = np.asarray(etiquetas)
+    ids = np.unique(etiquetas[etiquetas >= 0])
+
+    centroides = np.zeros((len(ids), embeddings.shape[1]), dtype=np.float32)
+    for k, c in enumerate(ids):
+        centroides[k] = embeddings[etiquetas == c].mean(axis=0)
+
+    centroides /= np.maximum(np.linalg.norm(centroides, axis=1, keepdims=True), 1e-12)
+    return ids, centroides
+
+
+def asignar_clusters(nuevos, clusterer=None, centroides=None, metodo="aproximado", umbral_ruido=None):
+    """
+    Etiquetas de cluster para embeddings nuevos sin re-ajustar HDBSCAN.
+
+    - "aproximado": hdbscan.approximate_predict sobre un clusterer
+      ajustado con prediction_data=True (puede devolver -1 = ruido).
+    - "centroide": centroide más cercano (similitud coseno) de
+      centroides_clusters; con umbral_ruido, los que quedan por debajo
+      se marcan como ruido.
+    """
+    nuevos = as_float(nuevos)
+    if len(nuevos) == 0:
+        return np.zeros(0, dtype=int)
 
-    etiquetas = clusterer.fit_predict(embeddings)
+    if metodo == "aproximado":
+        etiquetas, _ = hdbscan.approximate_predict(clusterer, nuevos)
+        return np.asarray(etiquetas)
 
-    return etiquetas
+    if metodo == "centroide":
+        ids, matriz = centroides
+        if len(ids) == 0:
+            return np.full(len(nuevos), -1)
+        normas = np.maximum(np.linalg.norm(nuevos, axis=1, keepdims=True), 1e-12)
+        sims = (nuevos / normas) @ matriz.T
+        mejor = np.argmax(sims, axis=1)
+        etiquetas = ids[mejor]
+        if umbral_ruido is not None:
+            etiquetas = np.where(sims[np.arange(len(nuevos)), mejor] >= umbral_ruido, etiquetas, -1)
+        return etiquetas
 
+    raise ValueError(f"Método de asignación no soportado: {metodo}")
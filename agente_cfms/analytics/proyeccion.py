@@ -0,0 +1,135 @@
+"""
+Proyección UMAP 2-D persistente de los embeddings CFMS.
+
+Se guarda en PROYECCION_DIR:
+- reducer.pkl → umap.UMAP ajustado
+- coords.npy  → coordenadas 2-D (fila i ↔ ids[i])
+- meta.json   → ids en orden y huella de los embeddings proyectados
+
+Con los mismos embeddings se devuelven las coordenadas guardadas sin
+tocar UMAP. Si solo hay artículos nuevos (los ya proyectados no cambiaron)
+se proyectan con reducer.transform y se agregan; si cambiaron vectores ya
+proyectados, o los nuevos superan una fracción del total, se re-ajusta.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+from common.embedding_store import as_float, hash_por_bloques
+
+PROYECCION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "output", "proyeccion_umap"))
+
+# Re-ajuste completo si los artículos nuevos superan esta fracción de los proyectados
+REFIT_NUEVOS = 0.5
+
+
+def _huella(x, filas=None, bloque=8192):
+    """sha256 de las filas `filas` de x (todas si es None) como float32, por bloques."""
+    if filas is None:
+        return hash_por_bloques(hashlib.sha256(), x, dtype=np.float32).hexdigest()
+
+    h = hashlib.sha256()
+    for i in range(0, len(filas), bloque):
+        h.update(memoryview(np.ascontiguousarray(x[filas[i:i + bloque]], dtype=np.float32)))
+    return h.hexdigest()
+
+
+def _escribir(path, escribir, modo="wb"):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, modo, **({} if "b" in modo else {"encoding": "utf-8"})) as f:
+        escribir(f)
+    os.replace(tmp, path)
+
+
+def _cargar(path):
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None, None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    coords = np.load(os.path.join(path, "coords.npy"))
+
+    # meta.json se escribe al final: si no coincide, la escritura se interrumpió
+    if len(meta["ids"]) != len(coords):
+        return None, None
+    return meta, coords
+
+
+def _cargar_reducer(path):
+    with open(os.path.join(path, "reducer.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+def cargar_proyeccion(path=PROYECCION_DIR):
+    """(ids, coords, reducer) guardados, o (None, None, None)."""
+    meta, coords = _cargar(path)
+    if meta is None:
+        return None, None, None
+    return meta["ids"], coords, _cargar_reducer(path)
+
+
+def _guardar(path, ids, coords, reducer, huella, guardar_reducer):
+    os.makedirs(path, exist_ok=True)
+    if guardar_reducer:
+        _escribir(os.path.join(path, "reducer.pkl"), lambda f: pickle.dump(reducer, f, protocol=pickle.HIGHEST_PROTOCOL))
+    _escribir(os.path.join(path, "coords.npy"), lambda f: np.save(f, coords))
+    _escribir(os.path.join(path, "meta.json"), lambda f: json.dump({"ids": ids, "huella": huella}, f), modo="w")
+
+
+def proyeccion_2d(embeddings, ids=None, path=PROYECCION_DIR, refit_nuevos=REFIT_NUEVOS, seed=42):
+    """
+    Coordenadas UMAP 2-D de cada fila de `embeddings` (en el mismo orden),
+    reutilizando o extendiendo la proyección guardada en `path`.
+    ids: id_articulo por fila (por defecto, la posición).
+    """
+    x = as_float(embeddings)
+    ids = [str(i) for i in (ids if ids is not None else range(len(x)))]
+
+    meta, coords_previas = _cargar(path)
+    if meta is not None:
+        previos = meta["ids"]
+        posicion = {i: k for k, i in enumerate(ids)}
+        filas_previas = [posicion.get(i) for i in previos]
+
+        if None not in filas_previas:
+            # Los artículos ya proyectados siguen ahí: ¿con los mismos vectores?
+            if _huella(x, filas_previas) == meta["huella"]:
+                conocidos = set(previos)
+                nuevas = [k for k, i in enumerate(ids) if i not in conocidos]
+
+                coords = np.empty((len(ids), 2), dtype=np.float32)
+                coords[filas_previas] = coords_previas
+
+                if not nuevas:
+                    print(f"[CACHE] Proyección UMAP reutilizada ({len(ids)} artículos)")
+                    return coords
+
+                if len(nuevas) <= refit_nuevos * len(previos):
+                    print(f"[INFO] Proyectando {len(nuevas)} artículos nuevos con UMAP.transform...")
+                    reducer = _cargar_reducer(path)
+                    coords[nuevas] = reducer.transform(x[nuevas])
+                    orden = filas_previas + nuevas
+                    _guardar(
+                        path, [ids[k] for k in orden], coords[orden], reducer,
+                        _huella(x, orden), guardar_reducer=False,
+                    )
+                    return coords
+
+    import umap
+
+    print(f"[INFO] Ajustando UMAP sobre {len(ids)} artículos...")
+    reducer = umap.UMAP(random_state=seed)
+    coords = reducer.fit_transform(x).astype(np.float32)
+    _guardar(path, ids, coords, reducer, _huella(x), guardar_reducer=True)
+    return coords
+
+
+def coordenadas(path=PROYECCION_DIR):
+    """{id_articulo: (x, y)} de la última proyección guardada (para otras vistas)."""
+    meta, coords = _cargar(path)
+    if meta is None:
+        return {}
+    return dict(zip(meta["ids"], map(tuple, coords.tolist())))
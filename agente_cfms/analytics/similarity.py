@@ -1,6 +1,177 @@
 
 import numpy as np
 
-def matriz_similitud(emb):
-    norm = emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-10)
-    return np.dot(norm, norm.T)
+def _normas_inversas(emb, bloque):
+    """1 / ||fila|| calculado por bloques (emb puede ser un memmap float16)."""
+    inv = np.empty(emb.shape[0], dtype=np.float32)
+    for i in range(0, emb.shape[0], bloque):
+        filas = np.asarray(emb[i:i + bloque], dtype=np.float32)
+        inv[i:i + bloque] = 1.0 / (np.linalg.norm(filas, axis=1) + 1e-10)
+    return inv
+
+
+def matriz_similitud(emb, bloque=2048):
+    """
+    Matriz de similitud coseno (n × n, float32).
+    Acepta arrays o memmaps (float32/float16) sin copiarlos completos:
+    solo se convierten a float32 los bloques de filas que se multiplican.
+    """
+    n = emb.shape[0]
+    inv = _normas_inversas(emb, bloque)
+    sim = np.empty((n, n), dtype=np.float32)
+
+    for i in range(0, n, bloque):
+        a = np.asarray(emb[i:i + bloque], dtype=np.float32) * inv[i:i + bloque, None]
+        for j in range(0, n, bloque):
+            b = np.asarray(emb[j:j + bloque], dtype=np.float32) * inv[j:j + bloque, None]
+            sim[i:i + bloque, j:j + bloque] = a @ b.T
+
+    return sim
+
+
+def similitud_dispersa(emb, k=30, umbral=None, memoria_mb=256, bloque=2048):
+    """
+    Vecinos más similares de cada artículo sin materializar la matriz n × n.
+
+    Procesa bloques de filas cuyo tamaño se ajusta a `memoria_mb` (cada
+    bloque ocupa filas × n float32 de similitudes más filas × n int64 de
+    índices de argpartition). Por fila conserva los
+    k vecinos más similares (k=None: todos) y, si se da `umbral`, solo
+    los que lo alcanzan. La diagonal se excluye.
+
+    Devuelve una scipy.sparse.csr_matrix (n × n, float32). No es simétrica
+    en general: j puede estar entre los k vecinos de i y no al revés.
+    """
+    from scipy import sparse
+
+    n = emb.shape[0]
+    inv = _normas_inversas(emb, bloque)
+
+    # 4 bytes de similitud + 8 del índice int64 de argpartition por celda
+    filas_bloque = max(1, (memoria_mb * 2 ** 20) // (12 * max(n, 1)))
+    k_efectivo = n - 1 if k is None else min(k, n - 1)
+
+    filas_out, cols_out, vals_out = [], [], []
+
+    for i in range(0, n, filas_bloque):
+        a = np.asarray(emb[i:i + filas_bloque], dtype=np.float32) * inv[i:i + filas_bloque, None]
+        m = a.shape[0]
+
+        sims = np.empty((m, n), dtype=np.float32)
+        for j in range(0, n, bloque):
+            b = np.asarray(emb[j:j + bloque], dtype=np.float32) * inv[j:j + bloque, None]
+            sims[:, j:j + bloque] = a @ b.T
+
+        if k_efectivo <= 0:
+            continue
+
+        # Se niega en el mismo buffer (sin copia): los k menores son los k
+        # más similares. La diagonal queda en +inf y se descarta abajo.
+        np.negative(sims, out=sims)
+        locales = np.arange(m)
+        sims[locales, i + locales] = np.inf
+
+        if k_efectivo < n - 1:
+            cols = np.argpartition(sims, k_efectivo - 1, axis=1)[:, :k_efectivo]
+        else:
+            cols = np.broadcast_to(np.arange(n), (m, n))
+        vals = -np.take_along_axis(sims, cols, axis=1)
+
+        mask = np.isfinite(vals)
+        if umbral is not None:
+            mask &= vals >= umbral
+
+        filas_out.append(np.broadcast_to((i + locales)[:, None], cols.shape)[mask])
+        cols_out.append(cols[mask])
+        vals_out.append(vals[mask])
+
+    if filas_out:
+        filas = np.concatenate(filas_out)
+        cols = np.concatenate(cols_out)
+        vals = np.concatenate(vals_out)
+    else:
+        filas = cols = np.zeros(0, dtype=np.int64)
+        vals = np.zeros(0, dtype=np.float32)
+
+    return sparse.csr_matrix((vals, (filas, cols)), shape=(n, n), dtype=np.float32)
+
+
+def similitud_agrupada(emb, etiquetas=None, max_pix=1024, modo="bloques", bloque=8192):
+    """
+    Similitud coseno media entre grupos de artículos, sin la matriz n × n.
+
+    Las filas se ordenan por etiqueta de cluster (si se dan) y se agrupan:
+    - modo="bloques": en min(n, max_pix) grupos contiguos del mismo tamaño
+      (promedio por bloques de la matriz reordenada).
+    - modo="clusters": un grupo por cluster (medias cluster-a-cluster).
+
+    Como la similitud es un producto punto de vectores normalizados, la
+    suma de similitudes entre dos grupos es el producto de sus sumas de
+    vectores: basta acumular, bloque a bloque de filas, la suma por grupo
+    (grupos × dim). El resultado es idéntico a promediar la matriz densa
+    y la memoria no depende de n.
+
+    Devuelve (matriz grupos × grupos float32, etiqueta del primer artículo
+    de cada grupo o None).
+    """
+    from scipy import sparse
+
+    n, dim = emb.shape
+    inv = _normas_inversas(emb, bloque)
+
+    if etiquetas is None:
+        orden = np.arange(n)
+    else:
+        etiquetas = np.asarray(etiquetas)
+        orden = np.argsort(etiquetas, kind="stable")
+
+    if modo == "clusters" and etiquetas is not None:
+        _, grupo_ordenado = np.unique(etiquetas[orden], return_inverse=True)
+    elif modo in ("bloques", "clusters"):
+        n_grupos = max(1, min(n, max_pix))
+        grupo_ordenado = np.arange(n) * n_grupos // max(n, 1)
+    else:
+        raise ValueError(f"Modo no soportado: {modo}")
+
+    n_grupos = int(grupo_ordenado.max()) + 1 if n else 0
+    grupo = np.empty(n, dtype=np.int64)
+    grupo[orden] = grupo_ordenado
+
+    sumas = np.zeros((n_grupos, dim), dtype=np.float64)
+    for i in range(0, n, bloque):
+        filas = np.asarray(emb[i:i + bloque], dtype=np.float32) * inv[i:i + bloque, None]
+        agrupar = sparse.csr_matrix(
+            (np.ones(len(filas), dtype=np.float32), (grupo[i:i + bloque], np.arange(len(filas)))),
+            shape=(n_grupos, len(filas)),
+        )
+        sumas += agrupar @ filas
+
+    tamanos = np.bincount(grupo, minlength=n_grupos).astype(np.float64)
+    medias = (sumas @ sumas.T) / np.maximum(np.outer(tamanos, tamanos), 1)
+
+    etiquetas_grupo = None
+    if etiquetas is not None:
+        primeros = np.searchsorted(grupo_ordenado, np.arange(n_grupos))
+        etiquetas_grupo = etiquetas[orden][primeros]
+
+    return medias.astype(np.float32), etiquetas_grupo
+
+
+def pares_similares(sim, umbral):
+    """
+    Pares (i, j, sim) con i < j y sim >= umbral, desde la matriz densa
+    o desde la dispersa (en la dispersa basta con que uno de los dos sea
+    vecino del otro).
+    """
+    from scipy import sparse
+
+    if sparse.issparse(sim):
+        sim = sparse.csr_matrix(sim, copy=True)
+        sim.data[sim.data < umbral] = 0
+        sim.eliminate_zeros()
+        sup = sparse.triu(sim.maximum(sim.T), k=1).tocoo()
+        return sup.row, sup.col, sup.data
+
+    sim = np.asarray(sim)
+    filas, cols = np.nonzero(np.triu(sim >= umbral, k=1))
+    return filas, cols, sim[filas, cols]
@@ -1,12 +1,18 @@
-from sentence_transformers import SentenceTransformer
+import os
 from agente_cfms.normalizer.normalizer import normalize_text
+from common.model_registry import get_embedding_model
+from common.embedding_cache import get_embedding_cache
+from common.embedding_store import EmbeddingStore
 import numpy as np
 
-# Modelo recomendado (mismo que en QWEN)
+# Modelo recomendado (mismo que en QWEN: se comparte la instancia del registro)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-# Cargar una sola vez
-_embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+# Almacén en disco (memmap) de los embeddings CFMS
+EMBEDDINGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "output", "embeddings"))
+
+# "float32" o "float16" (mitad de disco y memoria mapeada)
+EMBEDDINGS_DTYPE = "float32"
 
 def compute_embeddings(registros):
     """
@@ -45,12 +51,44 @@ def compute_embeddings(registros):
         texto = " | ".join(normalize_text(p) for p in partes)
         textos.append(texto)
 
-    # Embeddings reales — no se modifica
-    embeddings = _embedding_model.encode(
+    # Embeddings reales: la caché guarda los vectores crudos y solo
+    # los textos nuevos pasan por el modelo
+    cache = get_embedding_cache(EMBEDDING_MODEL)
+    embeddings = cache.encode(
         textos,
-        convert_to_numpy=True,
-        normalize_embeddings=True
+        lambda nuevos: get_embedding_model(EMBEDDING_MODEL).encode(
+            nuevos,
+            convert_to_numpy=True,
+            normalize_embeddings=False
+        ),
     )
+    print(cache.resumen())
+
+    # Misma normalización L2 que normalize_embeddings=True
+    normas = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(normas, 1e-12)
+
 
-    return embeddings
 
+def guardar_embeddings(registros, embeddings, path=EMBEDDINGS_DIR, dtype=EMBEDDINGS_DTYPE):
+    """
+    Guarda los embeddings en el EmbeddingStore indexado por id_articulo
+    (agrega los artículos nuevos, actualiza los existentes) y devuelve las
+    filas de `registros` como memmap, en el mismo orden.
+    """
+    ids = [r.get("id_articulo", i) for i, r in enumerate(registros)]
+
+    store = EmbeddingStore(path, dtype=dtype)
+    store.upsert(ids, embeddings)
+    print(f"[OK] Embeddings guardados en: {path} ({len(store)} artículos, {store.dtype.name})")
+
+    return store.rows(ids)
+
+
+def leer_embeddings(registros, path=EMBEDDINGS_DIR, dtype=EMBEDDINGS_DTYPE):
+    """
+    Filas de `registros` (memmap, en el mismo orden) de un almacén ya
+    escrito por guardar_embeddings, sin volver a calcular nada.
+    """
+    ids = [r.get("id_articulo", i) for i, r in enumerate(registros)]
+    return EmbeddingStore(path, dtype=dtype).rows(ids)
@@ -0,0 +1,128 @@
+"""
+Etapas del agente CFMS con entradas y salidas en disco, para ejecutarlas
+por separado desde el DAG de pipeline.py (common.dag).
+
+Hacen lo mismo que main(), pero cada una lee lo que dejó la anterior:
+- embeddings      → EmbeddingStore (EMBEDDINGS_DIR)
+- similitud       → PARES_PATH (aristas de similitud i < j); en modo "ann"
+                    el índice se construye en memoria
+- clustering      → CLUSTERS_PATH
+- taxonomia       → TAXONOMIA_PATH
+- visualizaciones → FIGURAS
+- reporte         → PDF_PATH
+
+Así un cambio en HDBSCAN solo repite clustering y lo que depende de él.
+"""
+
+import os
+import json
+import numpy as np
+
+from agente_cfms.loader.json_loader import BASE_DIR, cargar_json
+from agente_cfms.normalizer.normalizer import limpiar_registro
+from agente_cfms.embeddings.semantic_extractor import (
+    EMBEDDINGS_DIR,
+    compute_embeddings,
+    guardar_embeddings,
+    leer_embeddings,
+)
+from agente_cfms.analytics.similarity import pares_similares
+from agente_cfms.analytics.clustering import clusterizar, REDUCCION_DIMENSIONES
+from agente_cfms.graph.graph_builder import construir_grafo_desde_pares
+from agente_cfms.taxonomy.taxonomy_engine import generar_taxonomia
+from agente_cfms.reports.reporter import OUTPUT_DIR, exportar_json, generar_reporte
+from agente_cfms.reports.pdf_report import generar_reporte_pdf
+from agente_cfms.reports.visualizations import plot_umap, plot_heatmap, plot_grafo
+from agente_cfms.main import calcular_similitud
+
+ENTRADA_JSON = "data/articulos_estructurados.json"
+ENTRADA_JSON_PATH = os.path.join(BASE_DIR, ENTRADA_JSON)
+
+PARES_PATH = os.path.join(OUTPUT_DIR, "pares_similitud.npz")
+CLUSTERS_PATH = os.path.join(OUTPUT_DIR, "clusters.npy")
+TAXONOMIA_PATH = os.path.join(OUTPUT_DIR, "taxonomia_cfms.json")
+PDF_PATH = os.path.join(OUTPUT_DIR, "reporte_clinico.pdf")
+FIGURAS = [
+    os.path.join(OUTPUT_DIR, nombre)
+    for nombre in ("umap_clusters.png", "heatmap_similitud.png", "grafo_cfms.png")
+]
+
+
+def _registros():
+    return [limpiar_registro(r) for r in cargar_json(ENTRADA_JSON)]
+
+
+def _guardar_npy(path, guardar):
+    tmp = f"{path}.{os.getpid()}.tmp{os.path.splitext(path)[1]}"
+    guardar(tmp)
+    os.replace(tmp, path)
+
+
+def cargar_pares(path=PARES_PATH):
+    datos = np.load(path)
+    return datos["filas"], datos["cols"], datos["sims"]
+
+
+# ============================================
+# ETAPAS
+# ============================================
+def etapa_embeddings():
+    registros = _registros()
+    guardar_embeddings(registros, compute_embeddings(registros))
+
+
+def etapa_similitud(modo_similitud="auto", top_k=30, sim_threshold=0.75, memoria_mb=256):
+    embeddings = leer_embeddings(_registros())
+    sim = calcular_similitud(embeddings, modo_similitud, top_k, sim_threshold, memoria_mb)
+    filas, cols, sims = pares_similares(sim, sim_threshold)
+    _guardar_npy(PARES_PATH, lambda tmp: np.savez(tmp, filas=filas, cols=cols, sims=sims))
+
+
+def etapa_clustering(
+    min_cluster_size=3,
+    min_samples=1,
+    reduccion=None,
+    n_componentes=REDUCCION_DIMENSIONES,
+    algoritmo="best",
+    n_jobs=4,
+):
+    embeddings = leer_embeddings(_registros())
+    clusters = clusterizar(
+        embeddings, min_cluster_size, min_samples, reduccion, n_componentes, algoritmo, n_jobs
+    )
+    _guardar_npy(CLUSTERS_PATH, lambda tmp: np.save(tmp, np.asarray(clusters)))
+
+
+def etapa_taxonomia():
+    # generar_taxonomia solo usa registros y clusters
+    taxonomia = generar_taxonomia(None, _registros(), None, np.load(CLUSTERS_PATH))
+    exportar_json(taxonomia, os.path.basename(TAXONOMIA_PATH))
+    return taxonomia
+
+
+def etapa_visualizaciones():
+    registros = _registros()
+    embeddings = leer_embeddings(registros)
+    clusters = np.load(CLUSTERS_PATH)
+    ids = [r.get("id_articulo", i) for i, r in enumerate(registros)]
+
+    coords = plot_umap(embeddings, clusters, ids=ids)
+    plot_heatmap(embeddings=embeddings, clusters=clusters)
+    plot_grafo(construir_grafo_desde_pares(registros, cargar_pares()), coords=coords)
+
+
+def etapa_reporte():
+    with open(TAXONOMIA_PATH, "r", encoding="utf-8") as f:
+        taxonomia = json.load(f)
+    generar_reporte_pdf(PDF_PATH, generar_reporte(taxonomia))
+
+
+# Entradas y salidas de cada etapa, para declararlas en el DAG
+ENTRADAS_SALIDAS = {
+    "embeddings": ([ENTRADA_JSON_PATH], [EMBEDDINGS_DIR]),
+    "similitud": ([ENTRADA_JSON_PATH, EMBEDDINGS_DIR], [PARES_PATH]),
+    "clustering": ([ENTRADA_JSON_PATH, EMBEDDINGS_DIR], [CLUSTERS_PATH]),
+    "taxonomia": ([ENTRADA_JSON_PATH, CLUSTERS_PATH], [TAXONOMIA_PATH]),
+    "visualizaciones": ([ENTRADA_JSON_PATH, EMBEDDINGS_DIR, CLUSTERS_PATH, PARES_PATH], FIGURAS),
+    "reporte": ([TAXONOMIA_PATH], [PDF_PATH]),
+}
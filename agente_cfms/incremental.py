@@ -0,0 +1,271 @@
+"""
+Modo incremental del agente CFMS.
+
+Un ajuste completo (ajuste_completo) calcula embeddings, índice ANN,
+vecinos, HDBSCAN (con prediction_data) y taxonomía, y guarda el estado en
+ESTADO_DIR:
+- clusterer.pkl  → HDBSCAN ajustado (solo cambia en un ajuste completo)
+- estado.pkl     → ids en orden, clusters, centroides, aristas de
+                   similitud, taxonomía por índices y contador de
+                   actualizaciones
+- indice_ann.npz → índice ANN propio del estado: sus posiciones siguen el
+                   orden de estado["ids"] (main() y el DAG no lo tocan)
+
+Los embeddings viven en el EmbeddingStore.
+
+actualizar() procesa solo los artículos cuyo id_articulo no está en el
+estado: los embebe, los agrega al índice, calcula sus vecindarios, les
+asigna cluster (approximate_predict o centroide más cercano) y los agrega
+únicamente a sus buckets de la taxonomía. El cómputo depende del número
+de artículos nuevos; leer y escribir el estado sigue siendo lineal, pero
+solo es E/S. Cada REFIT_CADA actualizaciones, o cuando el corpus creció
+más de REFIT_CRECIMIENTO desde el último ajuste, se re-ajusta todo.
+
+Los artículos ya procesados cuyo contenido cambió no se re-evalúan hasta
+el siguiente ajuste completo.
+"""
+
+import os
+import pickle
+import numpy as np
+
+from agente_cfms.loader.json_loader import cargar_json
+from agente_cfms.normalizer.normalizer import limpiar_registro
+from agente_cfms.embeddings.semantic_extractor import compute_embeddings, guardar_embeddings
+from agente_cfms.analytics.similarity import similitud_dispersa, pares_similares
+from agente_cfms.analytics.clustering import ajustar_clusterer, centroides_clusters, asignar_clusters
+from agente_cfms.analytics.ann_index import ANNIndex
+from agente_cfms.graph.graph_builder import construir_grafo_desde_pares
+from agente_cfms.taxonomy.taxonomy_engine import generar_taxonomia, agregar_articulos
+from agente_cfms.reports.reporter import exportar_json
+
+ESTADO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "output", "estado_incremental"))
+
+# Actualizaciones incrementales entre re-ajustes completos (None = nunca)
+REFIT_CADA = 30
+
+# Re-ajuste completo si el corpus creció más que esta fracción desde el último
+REFIT_CRECIMIENTO = 0.5
+
+
+# ============================================
+# PERSISTENCIA DEL ESTADO
+# ============================================
+def _escribir_pickle(obj, path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _guardar_estado(estado, clusterer=None, path=ESTADO_DIR):
+    os.makedirs(path, exist_ok=True)
+    # El clusterer va primero: un estado.pkl nuevo nunca apunta a uno viejo
+    if clusterer is not None:
+        _escribir_pickle(clusterer, os.path.join(path, "clusterer.pkl"))
+    _escribir_pickle(estado, os.path.join(path, "estado.pkl"))
+
+
+def cargar_estado(path=ESTADO_DIR):
+    """(estado, clusterer) guardados, o (None, None) si no hay ajuste previo."""
+    estado_path = os.path.join(path, "estado.pkl")
+    clusterer_path = os.path.join(path, "clusterer.pkl")
+    if not (os.path.exists(estado_path) and os.path.exists(clusterer_path)):
+        return None, None
+
+    with open(estado_path, "rb") as f:
+        estado = pickle.load(f)
+    with open(clusterer_path, "rb") as f:
+        clusterer = pickle.load(f)
+    return estado, clusterer
+
+
+def _indice_path(path):
+    return os.path.join(path, "indice_ann.npz")
+
+
+def _id(r, i):
+    return r.get("id_articulo", i)
+
+
+def _parametros_clustering(clustering):
+    """
+    Parámetros de HDBSCAN para ajustar_clusterer. La reducción previa no
+    se admite: los artículos nuevos se asignan en el espacio original.
+    """
+    clustering = dict(clustering or {})
+    if clustering.pop("reduccion", None) is not None:
+        raise ValueError("El modo incremental no admite reduccion en clustering")
+    clustering.pop("n_componentes", None)
+    return clustering
+
+
+def _normalizar(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+# ============================================
+# AJUSTE COMPLETO
+# ============================================
+def ajuste_completo(registros, top_k=30, sim_threshold=0.75, path=ESTADO_DIR, embeddings=None, clustering=None):
+    """
+    Procesa el corpus entero y guarda el estado para las actualizaciones
+    incrementales. Devuelve la taxonomía.
+
+    embeddings: matriz ya calculada (fila i ↔ registros[i]); si es None se
+    calcula. clustering: parámetros de HDBSCAN (min_cluster_size,
+    min_samples, algoritmo, n_jobs).
+    """
+    print(f"[INFO] Ajuste completo sobre {len(registros)} artículos...")
+    clustering = _parametros_clustering(clustering)
+
+    embeddings = compute_embeddings(registros) if embeddings is None else _normalizar(embeddings)
+    embeddings = guardar_embeddings(registros, embeddings)
+    ids = [_id(r, i) for i, r in enumerate(registros)]
+
+    indice = ANNIndex().build(embeddings, ids)
+    os.makedirs(path, exist_ok=True)
+    indice.save(_indice_path(path))
+
+    sim = similitud_dispersa(embeddings, k=top_k, umbral=sim_threshold)
+    pares = pares_similares(sim, sim_threshold)
+
+    clusterer = ajustar_clusterer(embeddings, prediction_data=True, **clustering)
+    clusters = np.asarray(clusterer.labels_)
+
+    taxonomia = generar_taxonomia(None, registros, embeddings, clusters)
+
+    estado = {
+        "ids": ids,
+        "clusters": clusters,
+        "centroides": centroides_clusters(embeddings, clusters),
+        "pares": pares,
+        "taxonomia": taxonomia,
+        "actualizaciones": 0,
+        "n_ajuste": len(registros),
+        "parametros": {"top_k": top_k, "sim_threshold": sim_threshold, "clustering": clustering},
+    }
+    _guardar_estado(estado, clusterer, path)
+    exportar_json(taxonomia)
+
+    print(f"[OK] Estado incremental guardado en: {path}")
+    return taxonomia
+
+
+# ============================================
+# ACTUALIZACIÓN INCREMENTAL
+# ============================================
+def actualizar(
+    ruta="data/articulos_estructurados.json",
+    top_k=30,
+    sim_threshold=0.75,
+    metodo="aproximado",
+    refit_cada=REFIT_CADA,
+    refit_crecimiento=REFIT_CRECIMIENTO,
+    forzar_refit=False,
+    path=ESTADO_DIR,
+    registros=None,
+    embeddings=None,
+    clustering=None,
+):
+    """
+    Incorpora los artículos nuevos de `ruta` (o de `registros`, si se
+    pasan en memoria) a la taxonomía guardada.
+
+    metodo: "aproximado" (hdbscan.approximate_predict) o "centroide"
+    (centroide de cluster más cercano).
+
+    embeddings: matriz de todos los registros (fila i ↔ registros[i]); de
+    ella solo se usan las filas de los artículos nuevos. clustering:
+    parámetros de HDBSCAN para los ajustes completos.
+
+    Hace un ajuste completo si no hay estado, si cambiaron top_k,
+    sim_threshold o clustering, si forzar_refit, o si toca por
+    refit_cada / refit_crecimiento. Devuelve la taxonomía actualizada.
+    """
+    if registros is None:
+        registros = cargar_json(ruta)
+    registros = [limpiar_registro(r) for r in registros]
+    if embeddings is not None and len(embeddings) != len(registros):
+        raise ValueError(f"{len(embeddings)} embeddings para {len(registros)} registros")
+    estado, clusterer = cargar_estado(path)
+
+    def completo():
+        return ajuste_completo(registros, top_k, sim_threshold, path, embeddings, clustering)
+
+    parametros = {
+        "top_k": top_k,
+        "sim_threshold": sim_threshold,
+        "clustering": _parametros_clustering(clustering),
+    }
+    if estado is None or forzar_refit or estado["parametros"] != parametros:
+        return completo()
+
+    conocidos = {str(i) for i in estado["ids"]}
+    pendientes = [(i, r) for i, r in enumerate(registros) if str(_id(r, i)) not in conocidos]
+
+    if not pendientes:
+        print("[INFO] Sin artículos nuevos: la taxonomía no cambia.")
+        return estado["taxonomia"]
+
+    n_prev = len(estado["ids"])
+    toca_refit = refit_cada is not None and estado["actualizaciones"] + 1 >= refit_cada
+    crecimiento = (n_prev + len(pendientes) - estado["n_ajuste"]) / max(estado["n_ajuste"], 1)
+    if toca_refit or crecimiento > refit_crecimiento:
+        print("[INFO] Re-ajuste completo programado.")
+        return completo()
+
+    # Las aristas nuevas se arman con posiciones del índice: deben ser las del estado
+    indice = ANNIndex.load(_indice_path(path)) if os.path.exists(_indice_path(path)) else None
+    if indice is None or [str(i) for i in indice.ids] != [str(i) for i in estado["ids"]]:
+        print("[ADVERTENCIA] El índice ANN no coincide con el estado incremental: re-ajuste completo.")
+        return completo()
+
+    nuevos = [r for _, r in pendientes]
+    ids_nuevos = [_id(r, i) for i, r in pendientes]
+    print(f"[INFO] Actualización incremental: {len(nuevos)} artículos nuevos sobre {n_prev}.")
+
+    # 1. Embeddings solo de los nuevos
+    if embeddings is None:
+        embeddings = compute_embeddings(nuevos)
+    else:
+        embeddings = _normalizar(np.asarray(embeddings)[[i for i, _ in pendientes]])
+    guardar_embeddings(nuevos, embeddings)
+
+    # 2. Vecindarios de los nuevos (las posiciones del índice siguen el orden del estado)
+    indice.add(embeddings, ids_nuevos)
+    filas, cols, sims = indice.pares_desde(n_prev, k=top_k, umbral=sim_threshold)
+    indice.save(_indice_path(path))
+
+    # 3. Clusters sin re-ajustar
+    clusters = asignar_clusters(
+        embeddings, clusterer=clusterer, centroides=estado["centroides"], metodo=metodo
+    )
+
+    # 4. Solo los buckets de la taxonomía que tocan los nuevos
+    afectados = agregar_articulos(estado["taxonomia"], nuevos, clusters)
+
+    estado["ids"].extend(ids_nuevos)
+    estado["clusters"] = np.concatenate([estado["clusters"], clusters])
+    estado["pares"] = tuple(
+        np.concatenate([viejo, nuevo]) for viejo, nuevo in zip(estado["pares"], (filas, cols, sims))
+    )
+    estado["actualizaciones"] += 1
+    _guardar_estado(estado, path=path)
+    exportar_json(estado["taxonomia"])
+
+    print(
+        f"[OK] {len(nuevos)} artículos incorporados: {len(afectados)} buckets y "
+        f"{len(filas)} aristas de similitud actualizados."
+    )
+    return estado["taxonomia"]
+
+
+def cargar_grafo(path=ESTADO_DIR):
+    """CompactGraph del estado guardado (para visualizarlo), o None."""
+    estado, _ = cargar_estado(path)
+    if estado is None:
+        return None
+    registros = estado["taxonomia"]["Taxonomía Clínica CFMS"]["Artículos"]
+    return construir_grafo_desde_pares(registros, estado["pares"])
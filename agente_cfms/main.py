@@ -1,32 +1,124 @@
+import numpy as np
 from agente_cfms.loader.json_loader import cargar_json
 from agente_cfms.normalizer.normalizer import limpiar_registro
-from agente_cfms.embeddings.semantic_extractor import compute_embeddings
-from agente_cfms.analytics.similarity import matriz_similitud
+from agente_cfms.embeddings.semantic_extractor import compute_embeddings, guardar_embeddings
+from agente_cfms.analytics.similarity import matriz_similitud, similitud_dispersa
 from agente_cfms.analytics.clustering import clusterizar
+from agente_cfms.analytics.ann_index import ANNIndex
 from agente_cfms.graph.graph_builder import construir_grafo
 from agente_cfms.taxonomy.taxonomy_engine import generar_taxonomia
+from common.embedding_store import as_float
 
 from agente_cfms.reports.reporter import exportar_json
 from agente_cfms.reports.visualizations import plot_umap, plot_heatmap, plot_grafo
 
 
-def main():
-    print("Cargando artículos...")
+# A partir de este número de artículos la matriz n × n densa no se construye
+MAX_ARTICULOS_SIMILITUD_DENSA = 5000
 
-    registros_raw = cargar_json("data/articulos_estructurados.json")
-    registros = [limpiar_registro(r) for r in registros_raw]
 
-    print("Generando embeddings...")
-    embeddings = compute_embeddings(registros)
+def calcular_similitud(embeddings, modo_similitud="auto", top_k=30, sim_threshold=0.75, memoria_mb=256, indice=None):
+    """Similitud entre artículos según modo_similitud (ver main)."""
+    if modo_similitud == "auto":
+        modo_similitud = "densa" if len(embeddings) <= MAX_ARTICULOS_SIMILITUD_DENSA else "dispersa"
 
-    print("Calculando similitud...")
-    sim = matriz_similitud(embeddings)
+    print(f"Calculando similitud ({modo_similitud})...")
+    if modo_similitud == "dispersa":
+        return similitud_dispersa(embeddings, k=top_k, umbral=sim_threshold, memoria_mb=memoria_mb)
+    if modo_similitud == "ann":
+        indice = indice if indice is not None else ANNIndex().build(embeddings)
+        return indice.knn_graph(k=top_k, umbral=sim_threshold)
+    return matriz_similitud(embeddings)
+
+
+def main(
+    modo_similitud="auto",
+    top_k=30,
+    sim_threshold=0.75,
+    memoria_mb=256,
+    incremental=False,
+    registros=None,
+    embeddings=None,
+    persistir=True,
+    clustering=None,
+):
+    """
+    modo_similitud:
+    - "densa": matriz n × n completa (corpus pequeños).
+    - "dispersa": solo los top_k vecinos por artículo con similitud >=
+      sim_threshold, calculados por bloques con memoria acotada.
+    - "ann": igual que "dispersa" pero con vecinos aproximados del índice
+      ANN (costo subcuadrático). Solo en este modo se construye el índice
+      (y se guarda en ANN_INDEX_PATH si persistir).
+    - "auto": densa hasta MAX_ARTICULOS_SIMILITUD_DENSA artículos.
+
+    incremental=True: solo procesa los artículos nuevos sobre el estado
+    guardado (ver agente_cfms.incremental); no regenera las figuras.
+    Acepta registros, embeddings y clustering (sin reduccion); como el
+    estado vive en disco y usa su propia similitud (dispersa + ANN), no
+    admite persistir=False ni un modo_similitud distinto de "auto".
+
+    Entrega en memoria (p. ej. desde run_qwen):
+    - registros: lista de artículos; si es None se lee
+      data/articulos_estructurados.json.
+    - embeddings: matriz (fila i ↔ registros[i]); se normaliza (L2) igual
+      que compute_embeddings. Si es None se calcula.
+    - persistir=False: no escribe el almacén de embeddings ni el índice
+      ANN; solo las salidas (taxonomía y figuras).
+
+    clustering: parámetros extra para clusterizar (min_cluster_size,
+    reduccion, ...).
+    """
+    if incremental:
+        if not persistir:
+            raise ValueError("incremental=True guarda su estado en disco: no admite persistir=False")
+        if modo_similitud != "auto":
+            raise ValueError(f"incremental=True usa su propia similitud: no admite modo_similitud={modo_similitud!r}")
+
+        from agente_cfms.incremental import actualizar
+        return actualizar(
+            top_k=top_k,
+            sim_threshold=sim_threshold,
+            registros=registros,
+            embeddings=embeddings,
+            clustering=clustering,
+        )
+
+    if registros is None:
+        print("Cargando artículos...")
+        registros = cargar_json("data/articulos_estructurados.json")
+    registros = [limpiar_registro(r) for r in registros]
+
+    if embeddings is None:
+        print("Generando embeddings...")
+        embeddings = compute_embeddings(registros)
+    else:
+        embeddings = as_float(embeddings)
+        if len(embeddings) != len(registros):
+            raise ValueError(f"{len(embeddings)} embeddings para {len(registros)} registros")
+        normas = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(normas, 1e-12)
+
+    if persistir:
+        # A partir de aquí se trabaja sobre el memmap del almacén en disco
+        embeddings = guardar_embeddings(registros, embeddings)
+
+    ids = [r.get("id_articulo", i) for i, r in enumerate(registros)]
+    indice = None
+    if modo_similitud == "ann":
+        # El índice solo se construye (y guarda) cuando se va a consultar
+        print("Indexando embeddings (ANN)...")
+        indice = ANNIndex().build(embeddings, ids)
+        if persistir:
+            indice.save()
+
+    sim = calcular_similitud(embeddings, modo_similitud, top_k, sim_threshold, memoria_mb, indice)
 
     print("Clusterizando...")
-    clusters = clusterizar(embeddings)
+    clusters = clusterizar(embeddings, **(clustering or {}))
 
     print("Construyendo grafo...")
-    grafo = construir_grafo(registros, embeddings, sim)
+    grafo = construir_grafo(registros, embeddings, sim, sim_threshold=sim_threshold, formato="compacto")
 
     print("Generando taxonomía...")
     taxonomia = generar_taxonomia(grafo, registros, embeddings, clusters)
@@ -35,9 +127,9 @@ def main():
     exportar_json(taxonomia)
 
     print("Generando visualizaciones...")
-    plot_umap(embeddings, clusters)
-    plot_heatmap(sim)
-    plot_grafo(grafo)
+    coords = plot_umap(embeddings, clusters, ids=ids)
+    plot_heatmap(embeddings=embeddings, clusters=clusters)
+    plot_grafo(grafo, coords=coords)
 
     print("¡Proceso completo!")
     return taxonomia
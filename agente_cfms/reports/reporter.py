@@ -26,6 +26,9 @@ def generar_reporte(taxonomia):
     """
     Imprime en consola y también retorna el texto completo
     para poder guardarlo en PDF.
+
+    Solo cuenta artículos por categoría, así que sirve tanto para la
+    taxonomía por índices de generar_taxonomia como para vista_articulos().
     """
 
     texto = ""  # acumulador para PDF
@@ -1,24 +1,37 @@
 import os
 import numpy as np
-import umap
+import matplotlib
+
+# Solo se generan PNG; Agg no usa ventanas y funciona fuera del hilo
+# principal (el DAG de pipeline.py corre las etapas en un pool de hilos)
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import networkx as nx
 import matplotlib.colors as mcolors
+from agente_cfms.analytics.proyeccion import proyeccion_2d
+from common.layout import layout_grafo, posiciones_por_id
 
 
 OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "output"))
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Posiciones del grafo estático guardadas entre corridas
+LAYOUT_PATH = os.path.join(OUTPUT_DIR, "layout_grafo.npz")
+
 
 
 # ============================================
 # 1. UMAP CON CLUSTERS (COMPATIBLE CON HDBSCAN)
 # ============================================
-def plot_umap(embeddings, clusters, filename="umap_clusters.png"):
+def plot_umap(embeddings, clusters, filename="umap_clusters.png", ids=None):
+    """
+    La proyección 2-D se reutiliza entre corridas (ver analytics.proyeccion):
+    con los mismos embeddings no se vuelve a ajustar UMAP y los artículos
+    nuevos se proyectan con transform. ids: id_articulo por fila.
+    """
     print("[INFO] Generando UMAP...")
 
-    reducer = umap.UMAP(random_state=42)
-    emb_2d = reducer.fit_transform(embeddings)
+    emb_2d = proyeccion_2d(embeddings, ids)
 
     plt.figure(figsize=(8, 6))
 
@@ -51,21 +64,92 @@ def plot_umap(embeddings, clusters, filename="umap_clusters.png"):
     plt.savefig(path, dpi=200)
     plt.close()
     print(f"[OK] Gráfico UMAP guardado en: {path}")
+    return emb_2d
 
 
 
 # ============================================
 # 2. HEATMAP DE SIMILITUD SIN SEABORN
 # ============================================
-def plot_heatmap(sim_matrix, filename="heatmap_similitud.png"):
+def _reducir_dispersa(sim_matrix, max_pix):
+    """
+    Promedio por bloques de una matriz dispersa hasta max_pix × max_pix,
+    con productos dispersos (nunca se densifica la matriz n × n).
+    Las entradas no guardadas cuentan como 0.
+    """
+    from scipy import sparse
+
+    n = sim_matrix.shape[0]
+    bins = np.minimum(np.arange(n) * max_pix // max(n, 1), max_pix - 1)
+    agrupar = sparse.csr_matrix(
+        (np.ones(n, dtype=np.float32), (bins, np.arange(n))),
+        shape=(max_pix, n),
+    )
+    sumas = (agrupar @ sim_matrix @ agrupar.T).toarray()
+    tamanos = np.bincount(bins, minlength=max_pix).astype(np.float32)
+    return sumas / np.maximum(np.outer(tamanos, tamanos), 1)
+
+
+def plot_heatmap(
+    sim_matrix=None,
+    filename="heatmap_similitud.png",
+    max_pix=1024,
+    embeddings=None,
+    clusters=None,
+    modo="bloques",
+):
+    """
+    Acepta la matriz densa o la dispersa (CSR) de similitud_dispersa;
+    la dispersa se reduce por bloques a max_pix × max_pix antes de dibujar.
+
+    Modo escalable: con embeddings (y opcionalmente clusters) no se usa
+    sim_matrix. Las filas se ordenan por cluster y se promedian por
+    bloques hasta max_pix × max_pix (modo="bloques") o por pares de
+    clusters (modo="clusters") directamente desde los embeddings, sin
+    construir la matriz n × n: la memoria no depende del tamaño del corpus.
+    """
+    from scipy import sparse
+    from agente_cfms.analytics.similarity import similitud_agrupada
+
     print("[INFO] Generando heatmap de similitud...")
 
+    etiquetas_grupo = None
+    extent = None
+    if embeddings is not None:
+        sim_matrix, etiquetas_grupo = similitud_agrupada(embeddings, clusters, max_pix=max_pix, modo=modo)
+        if modo == "bloques":
+            # Ejes en número de artículo aunque cada píxel sea un bloque
+            n = embeddings.shape[0]
+            extent = (0, n, n, 0)
+    elif sparse.issparse(sim_matrix):
+        sim_matrix = _reducir_dispersa(sim_matrix, min(max_pix, sim_matrix.shape[0]))
+
     plt.figure(figsize=(10, 8))
-    plt.imshow(sim_matrix, cmap="viridis", aspect="auto")
+    plt.imshow(sim_matrix, cmap="viridis", aspect="auto", interpolation="nearest", extent=extent)
     plt.colorbar(label="Similitud")
-    plt.title("Matriz de Similitud")
-    plt.xlabel("Artículo")
-    plt.ylabel("Artículo")
+
+    if etiquetas_grupo is not None and modo == "clusters":
+        plt.title("Similitud media entre clusters")
+        ticks = np.arange(len(etiquetas_grupo))
+        nombres = [f"C{c}" if c != -1 else "Ruido" for c in etiquetas_grupo]
+        if len(ticks) <= 40:
+            plt.xticks(ticks, nombres, rotation=90)
+            plt.yticks(ticks, nombres)
+        plt.xlabel("Cluster")
+        plt.ylabel("Cluster")
+    else:
+        plt.title("Matriz de Similitud")
+        if etiquetas_grupo is not None:
+            # Límites entre clusters (las filas están ordenadas por cluster)
+            escala = embeddings.shape[0] / len(etiquetas_grupo)
+            for corte in (np.flatnonzero(np.diff(etiquetas_grupo)) + 1) * escala:
+                plt.axhline(corte, color="white", linewidth=0.4)
+                plt.axvline(corte, color="white", linewidth=0.4)
+            plt.xlabel("Artículo (ordenado por cluster)")
+            plt.ylabel("Artículo (ordenado por cluster)")
+        else:
+            plt.xlabel("Artículo")
+            plt.ylabel("Artículo")
 
     path = os.path.join(OUTPUT_DIR, filename)
     plt.savefig(path, dpi=200)
@@ -77,18 +161,28 @@ def plot_heatmap(sim_matrix, filename="heatmap_similitud.png"):
 # ============================================
 # 3. GRAFO — AVISO IMPORTANTE
 # ============================================
-def plot_grafo(grafo, filename="grafo_cfms.png"):
+def plot_grafo(grafo, filename="grafo_cfms.png", coords=None, layout_path=LAYOUT_PATH):
     """
     Este método genera un gráfico estático MUY limitado.
     El grafo REAL se debe visualizar con PyVis (HTML interactivo).
 
     Se deja este método solo para diagnóstico rápido.
+    Acepta el CompactGraph de construir_grafo(formato="compacto") (se convierte aquí).
+
+    Con un CompactGraph las posiciones salen de common.layout (repulsión
+    por rejilla, semillas = coords UMAP de los artículos) y se guardan en
+    layout_path: los nodos que no cambian conservan su lugar entre
+    corridas. Un networkx.Graph sigue usando spring_layout.
     """
+    if isinstance(grafo, nx.Graph):
+        pos = nx.spring_layout(grafo, seed=42)
+    else:
+        pos = posiciones_por_id(grafo, layout_grafo(grafo, semillas=coords, path=layout_path))
+        grafo = grafo.to_networkx()
 
     print("[ADVERTENCIA] Se recomienda usar PyVis para una visualización profesional del grafo.")
 
     plt.figure(figsize=(10, 10))
-    pos = nx.spring_layout(grafo, seed=42)
 
     # Colores por tipo de nodo
     color_map = []
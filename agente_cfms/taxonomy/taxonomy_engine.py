@@ -1,5 +1,6 @@
 import networkx as nx
 from collections import defaultdict
+from collections.abc import Sequence
 from agente_cfms.normalizer.normalizer import normalize_text
 
 
@@ -23,6 +24,11 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
     - clusters semánticos
     - categorías del grafo
     - relaciones artículo → categoría
+
+    Cada artículo aparece una sola vez, en la tabla "Artículos"; los
+    dominios, tareas, arquitecturas, tipos de datos, limitaciones y
+    clusters guardan solo índices de esa tabla. Para recorrer los
+    artículos de una categoría como dicts usar vista_articulos().
     """
 
     taxonomia = {
@@ -50,7 +56,7 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
             }
 
         art = registros[idx]
-        taxonomia["clusters"][cluster_id]["articulos"].append(art)
+        taxonomia["clusters"][cluster_id]["articulos"].append(idx)
 
         # Normalizar claves
         dom = to_key(art.get("dominio_medico"))
@@ -70,7 +76,7 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
     # =====================================
     # 2. ESTRUCTURA JERÁRQUICA GLOBAL
     # =====================================
-    for art in registros:
+    for idx, art in enumerate(registros):
 
         dom = to_key(art.get("dominio_medico"))
         tar = to_key(art.get("tarea_principal"))
@@ -78,21 +84,21 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
         tip = to_key(art.get("tipo_datos"))
 
         if dom:
-            taxonomia["dominios"][dom].append(art)
+            taxonomia["dominios"][dom].append(idx)
 
         if tar:
-            taxonomia["tareas"][tar].append(art)
+            taxonomia["tareas"][tar].append(idx)
 
         if arc:
-            taxonomia["arquitecturas"][arc].append(art)
+            taxonomia["arquitecturas"][arc].append(idx)
 
         if tip:
-            taxonomia["tipos_datos"][tip].append(art)
+            taxonomia["tipos_datos"][tip].append(idx)
 
         # Limitaciones — lista
         for lim in art.get("limitaciones_reportadas", []):
             lim_key = to_key(lim)
-            taxonomia["limitaciones"][lim_key].append(art)
+            taxonomia["limitaciones"][lim_key].append(idx)
 
     # =====================================
     # 3. TAXONOMÍA FINAL MULTINIVEL
@@ -100,6 +106,7 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
 
     estructura = {
         "Taxonomía Clínica CFMS": {
+            "Artículos": registros,
             "Dominios Clínicos": dict(taxonomia["dominios"]),
             "Tareas de IA": dict(taxonomia["tareas"]),
             "Arquitecturas de Modelo": dict(taxonomia["arquitecturas"]),
@@ -111,3 +118,99 @@ def generar_taxonomia(grafo, registros, embeddings, clusters):
 
     return estructura
 
+
+
+def agregar_articulos(taxonomia, registros, clusters):
+    """
+    Agrega artículos nuevos a una taxonomía de generar_taxonomia, en su
+    lugar: se anexan a la tabla "Artículos" y sus índices solo a los
+    buckets a los que pertenecen. El costo depende de los artículos
+    nuevos, no del tamaño de la taxonomía.
+
+    Devuelve el conjunto de buckets tocados: (sección, clave).
+    """
+    t = taxonomia["Taxonomía Clínica CFMS"]
+    tabla = t["Artículos"]
+    inicio = len(tabla)
+    tabla.extend(registros)
+
+    afectados = set()
+
+    def agregar(seccion, clave, idx):
+        if clave:
+            t[seccion].setdefault(clave, []).append(idx)
+            afectados.add((seccion, clave))
+
+    for idx, (art, c) in enumerate(zip(registros, clusters), start=inicio):
+        dom = to_key(art.get("dominio_medico"))
+        tar = to_key(art.get("tarea_principal"))
+        arc = to_key(art.get("arquitectura_modelo"))
+        tip = to_key(art.get("tipo_datos"))
+
+        # Cluster
+        cluster_id = int(c)
+        cluster = t["Clusters Semánticos"].setdefault(cluster_id, {
+            "articulos": [],
+            "dominios": defaultdict(int),
+            "tareas": defaultdict(int),
+            "arquitecturas": defaultdict(int),
+            "tipo_datos": defaultdict(int),
+        })
+        cluster["articulos"].append(idx)
+        for campo, clave in (("dominios", dom), ("tareas", tar), ("arquitecturas", arc), ("tipo_datos", tip)):
+            if clave:
+                cluster[campo][clave] = cluster[campo].get(clave, 0) + 1
+        afectados.add(("Clusters Semánticos", cluster_id))
+
+        # Estructura global
+        agregar("Dominios Clínicos", dom, idx)
+        agregar("Tareas de IA", tar, idx)
+        agregar("Arquitecturas de Modelo", arc, idx)
+        agregar("Tipos de Datos", tip, idx)
+        for lim in art.get("limitaciones_reportadas", []):
+            lim_key = to_key(lim)
+            t["Limitaciones Reportadas"].setdefault(lim_key, []).append(idx)
+            afectados.add(("Limitaciones Reportadas", lim_key))
+
+    return afectados
+
+
+# =====================================
+# VISTA DE COMPATIBILIDAD (índices → artículos)
+# =====================================
+class ArticulosPorIndice(Sequence):
+    """Secuencia de solo lectura de artículos de la tabla, sin copiarlos."""
+
+    def __init__(self, tabla, indices):
+        self.tabla = tabla
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return ArticulosPorIndice(self.tabla, self.indices[i])
+        return self.tabla[self.indices[i]]
+
+
+def vista_articulos(taxonomia):
+    """
+    Misma estructura que generar_taxonomia pero con cada lista de índices
+    reemplazada por una ArticulosPorIndice, para el código que espera las
+    listas de dicts de artículo del formato anterior.
+    """
+    t = taxonomia["Taxonomía Clínica CFMS"]
+    tabla = t["Artículos"]
+
+    vista = {
+        seccion: {clave: ArticulosPorIndice(tabla, indices) for clave, indices in grupos.items()}
+        for seccion, grupos in t.items()
+        if seccion not in ("Artículos", "Clusters Semánticos")
+    }
+    vista["Artículos"] = tabla
+    vista["Clusters Semánticos"] = {
+        cid: {**datos, "articulos": ArticulosPorIndice(tabla, datos["articulos"])}
+        for cid, datos in t["Clusters Semánticos"].items()
+    }
+    return {"Taxonomía Clínica CFMS": vista}
@@ -0,0 +1,58 @@
+"""
+Recall y latencia del índice ANN (IVF) frente a la búsqueda exacta con
+matriz_similitud, sobre embeddings sintéticos con estructura de clusters.
+
+    python -m benchmarks.bench_ann_recall
+"""
+
+import time
+import numpy as np
+from agente_cfms.analytics.similarity import matriz_similitud
+from agente_cfms.analytics.ann_index import ANNIndex
+
+K = 10
+
+
+def _embeddings(n, dim=384, n_temas=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centros = rng.standard_normal((n_temas, dim))
+    temas = rng.integers(0, n_temas, n)
+    emb = centros[temas] + 0.8 * rng.standard_normal((n, dim))
+    return emb.astype(np.float32)
+
+
+def main(n=5000, n_consultas=500):
+    emb = _embeddings(n)
+    rng = np.random.default_rng(1)
+    consultas = rng.choice(n, n_consultas, replace=False)
+
+    inicio = time.perf_counter()
+    sim = matriz_similitud(emb)
+    t_exacta = time.perf_counter() - inicio
+    np.fill_diagonal(sim, -np.inf)
+    exactos = np.argsort(-sim[consultas], axis=1)[:, :K]
+    del sim
+
+    inicio = time.perf_counter()
+    indice = ANNIndex().build(emb)
+    t_build = time.perf_counter() - inicio
+
+    print(f"n = {n}, dim = {emb.shape[1]}, listas = {len(indice.centroides)}")
+    print(f"matriz_similitud (exacta): {t_exacta:.2f} s | build ANN: {t_build:.2f} s\n")
+
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        aciertos = 0
+        inicio = time.perf_counter()
+        for q, exacto in zip(consultas, exactos):
+            vecinos = [i for i, _ in indice.query(emb[q], k=K + 1, n_probe=n_probe) if i != q][:K]
+            aciertos += len(set(vecinos) & set(exacto.tolist()))
+        latencia = (time.perf_counter() - inicio) / n_consultas
+
+        print(
+            f"n_probe = {n_probe:>2} | recall@{K}: {aciertos / (K * n_consultas):.3f} "
+            f"| {latencia * 1000:.3f} ms/consulta"
+        )
+
+
+if __name__ == "__main__":
+    main()
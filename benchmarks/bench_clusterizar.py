@@ -0,0 +1,59 @@
+"""
+Tiempo y concordancia (ARI) de clusterizar con reducción previa y
+algoritmos boruvka frente al camino actual (HDBSCAN directo en 384D),
+sobre embeddings sintéticos con temas conocidos.
+
+    python -m benchmarks.bench_clusterizar
+"""
+
+import time
+import tempfile
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+import agente_cfms.analytics.clustering as clustering
+
+DIM = 384
+
+
+def _datos(n, temas=25, seed=0):
+    rng = np.random.default_rng(seed)
+    etiquetas = rng.integers(0, temas, n)
+    centros = rng.standard_normal((temas, DIM))
+    emb = centros[etiquetas] + 1.1 * rng.standard_normal((n, DIM))
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    return emb.astype(np.float32), etiquetas
+
+
+def _medir(emb, **opciones):
+    inicio = time.perf_counter()
+    etiquetas = clustering.clusterizar(emb, min_cluster_size=10, min_samples=5, **opciones)
+    return etiquetas, time.perf_counter() - inicio
+
+
+def main():
+    # Caché de reducciones en un directorio temporal (primera vez = sin caché)
+    cache_dir = tempfile.mkdtemp()
+
+    modos = {
+        "pca32 + boruvka_kdtree": dict(reduccion="pca", n_componentes=32, algoritmo="boruvka_kdtree"),
+        "pca32 (caché)": dict(reduccion="pca", n_componentes=32, algoritmo="boruvka_kdtree"),
+        "umap16 + boruvka_kdtree": dict(reduccion="umap", n_componentes=16, algoritmo="boruvka_kdtree"),
+        "umap16 (caché)": dict(reduccion="umap", n_componentes=16, algoritmo="boruvka_kdtree"),
+    }
+
+    print(f"{'n':>6} | {'modo':<24} | {'tiempo':>8} | {'ARI vs actual':>13} | {'ARI vs temas':>12}")
+    for n in (2000, 8000):
+        emb, temas = _datos(n)
+        base, t_base = _medir(emb)
+        print(f"{n:>6} | {'actual (384D, best)':<24} | {t_base:>7.2f}s | {1.0:>13.3f} | {adjusted_rand_score(temas, base):>12.3f}")
+
+        for nombre, opciones in modos.items():
+            etiquetas, t = _medir(emb, cache_dir=cache_dir, **opciones)
+            print(
+                f"{n:>6} | {nombre:<24} | {t:>7.2f}s | "
+                f"{adjusted_rand_score(base, etiquetas):>13.3f} | {adjusted_rand_score(temas, etiquetas):>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
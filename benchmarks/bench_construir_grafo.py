@@ -0,0 +1,89 @@
+"""
+Tiempo de construir_grafo según n, frente a la versión anterior con
+bucle por pares (i, j) y add_edge por arista.
+
+La comparación es con la misma salida (networkx.Graph, formato por
+defecto). La columna "compacto" es aparte: solo el CompactGraph, sin
+materializar networkx, y no es comparable con "anterior".
+
+    python -m benchmarks.bench_construir_grafo
+"""
+
+import time
+import numpy as np
+import networkx as nx
+from agente_cfms.normalizer.normalizer import normalize_text
+from agente_cfms.analytics.similarity import matriz_similitud
+from agente_cfms.graph.graph_builder import construir_grafo
+
+
+def _construir_grafo_anterior(registros, sim_matrix, sim_threshold=0.75):
+    """Implementación previa (solo artículos, categorías básicas y similitud)."""
+    G = nx.Graph()
+    for i, r in enumerate(registros):
+        G.add_node(f"art_{i}", tipo="articulo", titulo=r.get("titulo"))
+
+    def add_category_node(prefix, value):
+        if not value:
+            return None
+        node_id = f"{prefix}_{normalize_text(str(value)).replace(' ', '_')}"
+        if node_id not in G:
+            G.add_node(node_id, tipo=prefix, etiqueta=value)
+        return node_id
+
+    for i, r in enumerate(registros):
+        for prefix, campo in (("arquitectura", "arquitectura_modelo"), ("tarea", "tarea_principal"), ("dominio", "dominio_medico")):
+            nodo = add_category_node(prefix, r.get(campo))
+            if nodo:
+                G.add_edge(f"art_{i}", nodo)
+
+    n = len(registros)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if sim_matrix[i][j] >= sim_threshold:
+                G.add_edge(f"art_{i}", f"art_{j}", tipo="similitud", peso=float(sim_matrix[i][j]))
+    return G
+
+
+def _datos(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    temas = rng.integers(0, 20, n)
+    emb = rng.standard_normal((20, dim))[temas] + 0.9 * rng.standard_normal((n, dim))
+    registros = [
+        {
+            "titulo": f"Artículo {i}",
+            "arquitectura_modelo": f"arq {temas[i] % 7}",
+            "tarea_principal": f"tarea {temas[i] % 5}",
+            "dominio_medico": f"dominio {temas[i] % 9}",
+        }
+        for i in range(n)
+    ]
+    return registros, matriz_similitud(emb.astype(np.float32))
+
+
+def main():
+    print(f"{'n':>6} | {'aristas':>9} | {'anterior':>10} | {'vectorizado':>11} | {'compacto':>9}")
+    for n in (500, 1000, 2000, 4000):
+        registros, sim = _datos(n)
+
+        inicio = time.perf_counter()
+        anterior = _construir_grafo_anterior(registros, sim)
+        t_anterior = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        nuevo = construir_grafo(registros, None, sim)
+        t_nuevo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        compacto = construir_grafo(registros, None, sim, formato="compacto")
+        t_compacto = time.perf_counter() - inicio
+
+        assert anterior.number_of_edges() == nuevo.number_of_edges() == compacto.number_of_edges()
+        print(
+            f"{n:>6} | {nuevo.number_of_edges():>9} | {t_anterior:>9.2f}s | {t_nuevo:>10.2f}s | "
+            f"{t_compacto:>8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
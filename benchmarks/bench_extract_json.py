@@ -0,0 +1,91 @@
+"""
+Micro-benchmark del extractor de JSON de QWEN.
+
+Compara el extractor anterior (regex + json.loads por candidato) con
+qwen.json_extract.extract_json_object sobre salidas adversariales largas.
+
+    python -m benchmarks.bench_extract_json
+"""
+
+import re
+import json
+import time
+from qwen.json_extract import extract_json_object
+
+REGISTRO = {
+    "arquitectura_modelo": "Transformer {encoder}",
+    "tarea_principal": "Clasificación",
+    "dominio_medico": "Cardiología",
+    "tipo_datos": ["ECG", "EHR"],
+    "recursos_datos": {"fuente": {"nombre": "MIMIC", "meta": {"anio": 2020}}},
+    "limitaciones_reportadas": ["tamaño de muestra"],
+    "comentarios_relevantes": "usa \"comillas\" y llaves } sueltas",
+}
+
+
+def _extractor_regex(text):
+    """Implementación previa, copiada para comparar."""
+    code_blocks = re.findall(r"```json(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    for block in code_blocks:
+        try:
+            json.loads(block.strip())
+            return block.strip()
+        except ValueError:
+            pass
+
+    brace_blocks = re.findall(r"\{(?:[^{}]|(?:\{[^{}]*\}))*\}", text, re.DOTALL)
+
+    valid = []
+    for block in brace_blocks:
+        try:
+            json.loads(block)
+            valid.append(block)
+        except ValueError:
+            pass
+
+    if valid:
+        return max(valid, key=len)
+
+    return "{}"
+
+
+def _casos(n):
+    """Cada caso: (texto, objeto que debería extraerse)."""
+    objeto = json.dumps(REGISTRO, ensure_ascii=False)
+    profundo = json.loads("{\"a\": " * 50 + "1" + "}" * 50)
+    return {
+        "respuesta + texto sobrante": (objeto + " Nota: " + "texto libre " * n, REGISTRO),
+        "muchos objetos pequeños": (" ".join('{"k": %d}' % i for i in range(n)) + objeto, REGISTRO),
+        "llaves sin cerrar": ("{ " * n + objeto, REGISTRO),
+        "anidamiento profundo": (json.dumps(profundo) + " {x" * n, profundo),
+    }
+
+
+def _medir(fn, texto, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    for n in (1_000, 5_000, 20_000):
+        print(f"\n=== n = {n} ===")
+        for nombre, (texto, esperado) in _casos(n).items():
+            t_regex = _medir(_extractor_regex, texto)
+            t_nuevo = _medir(extract_json_object, texto)
+
+            ok_regex = json.loads(_extractor_regex(texto)) == esperado
+            ok_nuevo = extract_json_object(texto) == esperado
+
+            print(
+                f"{nombre:<28} {len(texto):>9} chars | "
+                f"regex: {t_regex * 1000:9.2f} ms ({'ok' if ok_regex else 'MAL'}) | "
+                f"raw_decode: {t_nuevo * 1000:8.2f} ms ({'ok' if ok_nuevo else 'MAL'})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Memoria y tiempo de recorrido (grado ponderado) del grafo compacto (CSR) frente al
+networkx.Graph equivalente, para corpus sintéticos de tamaño creciente.
+
+    python -m benchmarks.bench_grafo_compacto
+"""
+
+import gc
+import time
+import tracemalloc
+import numpy as np
+from agente_cfms.analytics.similarity import similitud_dispersa
+from agente_cfms.graph.graph_builder import construir_grafo
+from benchmarks.bench_construir_grafo import _datos
+
+
+def _medir(construir):
+    tracemalloc.start()
+    objeto = construir()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objeto, memoria / 2**20
+
+
+def main():
+    print(f"{'n':>6} | {'aristas':>8} | {'CSR MB':>7} | {'networkx MB':>11} | {'grado CSR':>9} | {'grado nx':>8}")
+    for n in (1000, 4000, 16000):
+        registros, _ = _datos(n // 4)
+        registros = registros * 4
+        rng = np.random.default_rng(1)
+        emb = rng.standard_normal((n, 64)).astype(np.float32)
+        sim = similitud_dispersa(emb, k=20, umbral=0.0)
+
+        compacto, mb_csr = _medir(lambda: construir_grafo(registros, emb, sim, sim_threshold=0.0, formato="compacto"))
+        grafo_nx, mb_nx = _medir(compacto.to_networkx)
+
+        gc.collect()
+        inicio = time.perf_counter()
+        grado_csr = np.asarray(compacto.adyacencia().sum(axis=1)).ravel()
+        t_csr = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        grado_nx = dict(grafo_nx.degree(weight="peso"))
+        t_nx = time.perf_counter() - inicio
+
+        assert np.allclose(grado_csr, list(grado_nx.values()), rtol=1e-4)
+        print(
+            f"{n:>6} | {compacto.number_of_edges():>8} | {mb_csr:>7.1f} | {mb_nx:>11.1f} | "
+            f"{t_csr * 1e3:>7.2f}ms | {t_nx * 1e3:>6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
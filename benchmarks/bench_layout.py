@@ -0,0 +1,81 @@
+"""
+Layout del grafo CFMS: common.layout (rejilla + semillas UMAP, con
+caché) frente a nx.spring_layout sobre el mismo grafo.
+
+Calidad: largo medio de las aristas dividido por la distancia media entre
+pares de nodos al azar (menor = vecinos más juntos), en cajas iguales.
+
+    python -m benchmarks.bench_layout
+"""
+
+import os
+import time
+import tempfile
+import numpy as np
+import networkx as nx
+from agente_cfms.analytics.similarity import similitud_dispersa
+from agente_cfms.graph.graph_builder import construir_grafo
+from common.layout import layout_grafo
+from benchmarks.bench_construir_grafo import _datos
+
+
+def _calidad(grafo, pos, rng):
+    pos = (pos - pos.min(axis=0)) / max(np.ptp(pos, axis=0).max(), 1e-12)
+    filas = np.repeat(np.arange(grafo.number_of_nodes()), grafo.grado())
+    aristas = np.linalg.norm(pos[filas] - pos[grafo.indices], axis=1).mean()
+    a, b = rng.integers(0, len(pos), (2, 20000))
+    return aristas / np.linalg.norm(pos[a] - pos[b], axis=1).mean()
+
+
+def _grafo(n, seed=0):
+    registros, _ = _datos(n, seed=seed)
+    rng = np.random.default_rng(seed)
+    temas = rng.integers(0, 20, n)
+    emb = (rng.standard_normal((20, 64))[temas] + 0.8 * rng.standard_normal((n, 64))).astype(np.float32)
+    sim = similitud_dispersa(emb, k=5, umbral=0.5)
+    # Semillas tipo UMAP: coordenadas 2-D del tema con ruido
+    semillas = rng.standard_normal((20, 2))[temas] * 5 + rng.standard_normal((n, 2))
+    return registros, emb, sim, semillas
+
+
+def main():
+    rng = np.random.default_rng(0)
+    directorio = tempfile.mkdtemp()
+
+    print(f"{'n':>6} | {'nodos':>6} | {'aristas':>7} | {'spring':>9} | {'layout':>9} | {'caché':>7} | {'+1% nuevos':>10} | {'calidad spring/layout':>21}")
+    for n in (500, 2000, 5000):
+        registros, emb, sim, semillas = _grafo(n)
+        grafo = construir_grafo(registros, emb, sim, sim_threshold=0.5, formato="compacto")
+        path = os.path.join(directorio, f"layout_{n}.npz")
+
+        inicio = time.perf_counter()
+        G = grafo.to_networkx()
+        pos_spring = nx.spring_layout(G, seed=42)
+        t_spring = time.perf_counter() - inicio
+        pos_spring = np.array([pos_spring[grafo.nodo_id(k)] for k in range(grafo.number_of_nodes())])
+
+        inicio = time.perf_counter()
+        pos = layout_grafo(grafo, semillas=semillas, path=path)
+        t_layout = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        layout_grafo(grafo, semillas=semillas, path=path)
+        t_cache = time.perf_counter() - inicio
+
+        # 1% de artículos nuevos: solo ellos se acomodan
+        extra = max(1, n // 100)
+        registros2, emb2, sim2, semillas2 = _grafo(n + extra)
+        grafo2 = construir_grafo(registros2, emb2, sim2, sim_threshold=0.5, formato="compacto")
+        inicio = time.perf_counter()
+        layout_grafo(grafo2, semillas=semillas2, path=path)
+        t_nuevos = time.perf_counter() - inicio
+
+        print(
+            f"{n:>6} | {grafo.number_of_nodes():>6} | {grafo.number_of_edges():>7} | "
+            f"{t_spring:>8.2f}s | {t_layout:>8.2f}s | {t_cache:>6.3f}s | {t_nuevos:>9.2f}s | "
+            f"{_calidad(grafo, pos_spring, rng):>10.3f} / {_calidad(grafo, pos, rng):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Grafo artículo–categoría compacto, respaldado por arrays CSR.
+
+Los nodos se numeran 0..n-1 (artículos, en el orden de los registros)
+y n..n+m-1 (categorías, en el orden en que aparecen). En memoria solo hay:
+- tipos_nodo      → int8 por nodo (código en self.tipos; 0 = "articulo")
+- categorias      → id de nodo y etiqueta de cada categoría (m entradas)
+- indptr/indices  → adyacencia CSR simétrica (int64 / int32)
+- pesos           → float32 por arista (1.0 en las de categoría)
+- tipos_arista    → int8 por arista (ARISTA_CATEGORIA / ARISTA_SIMILITUD)
+
+Los atributos de los artículos (título, arquitectura, ...) no se copian:
+se leen de los registros solo al convertir con to_networkx(), que es lo
+que necesitan pyvis y matplotlib. La memoria crece con el número de
+aristas, no con dicts por nodo y por arista.
+"""
+
+import numpy as np
+
+ARISTA_CATEGORIA = 0
+ARISTA_SIMILITUD = 1
+
+
+class CompactGraph:
+    def __init__(
+        self,
+        n_articulos,
+        tipos,
+        tipos_nodo,
+        categoria_ids,
+        categoria_etiquetas,
+        indptr,
+        indices,
+        pesos,
+        tipos_arista,
+        formato_articulo="art_{}",
+        atributos_articulo=None,
+        atributos_categoria=None,
+    ):
+        self.n_articulos = n_articulos
+        self.tipos = list(tipos)
+        self.tipos_nodo = tipos_nodo
+        self.categoria_ids = categoria_ids
+        self.categoria_etiquetas = categoria_etiquetas
+        self.indptr = indptr
+        self.indices = indices
+        self.pesos = pesos
+        self.tipos_arista = tipos_arista
+        self.formato_articulo = formato_articulo
+        self._atributos_articulo = atributos_articulo
+        self._atributos_categoria = atributos_categoria
+        self._indice_categoria = {nid: n_articulos + k for k, nid in enumerate(categoria_ids)}
+
+    # ============================================
+    # CONSTRUCCIÓN
+    # ============================================
+    @classmethod
+    def desde_registros(
+        cls,
+        registros,
+        categorias_articulo,
+        pares_similitud=None,
+        formato_articulo="art_{}",
+        atributos_articulo=None,
+        atributos_categoria=None,
+    ):
+        """
+        categorias_articulo(registro) → iterable de (tipo, node_id, etiqueta)
+        con las categorías del artículo (None en node_id = se omite).
+
+        pares_similitud: (filas, cols, sims) con i < j, p. ej. la salida de
+        pares_similares o similarity_edges.
+
+        atributos_articulo(i, registro) y atributos_categoria(tipo, etiqueta)
+        dan los atributos de cada nodo en to_networkx().
+        """
+        n = len(registros)
+        tipos = {"articulo": 0}
+        indice_categoria = {}
+        cat_ids, cat_etiquetas, cat_tipos = [], [], []
+        filas, cats = [], []
+
+        for i, r in enumerate(registros):
+            for tipo, node_id, etiqueta in categorias_articulo(r):
+                if node_id is None:
+                    continue
+                k = indice_categoria.get(node_id)
+                if k is None:
+                    k = indice_categoria[node_id] = len(cat_ids)
+                    cat_ids.append(node_id)
+                    cat_etiquetas.append(etiqueta)
+                    cat_tipos.append(tipos.setdefault(tipo, len(tipos)))
+                filas.append(i)
+                cats.append(k)
+
+        total = n + len(cat_ids)
+
+        # Artículo → categoría, sin duplicados (un artículo puede repetir
+        # una limitación)
+        claves = np.unique(np.asarray(filas, dtype=np.int64) * total + np.asarray(cats, dtype=np.int64) + n)
+        u_cat, v_cat = claves // total, claves % total
+
+        if pares_similitud is None:
+            u_sim = v_sim = np.empty(0, dtype=np.int64)
+            w_sim = np.empty(0, dtype=np.float32)
+        else:
+            u_sim, v_sim, w_sim = (np.asarray(a) for a in pares_similitud)
+
+        u = np.concatenate([u_cat, u_sim.astype(np.int64)])
+        v = np.concatenate([v_cat, v_sim.astype(np.int64)])
+        w = np.concatenate([np.ones(len(u_cat), dtype=np.float32), w_sim.astype(np.float32)])
+        t = np.concatenate([
+            np.full(len(u_cat), ARISTA_CATEGORIA, dtype=np.int8),
+            np.full(len(u_sim), ARISTA_SIMILITUD, dtype=np.int8),
+        ])
+
+        # Adyacencia simétrica: cada arista se guarda en ambas filas
+        origen = np.concatenate([u, v])
+        destino = np.concatenate([v, u])
+        orden = np.lexsort((destino, origen))
+
+        indptr = np.zeros(total + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origen, minlength=total), out=indptr[1:])
+
+        tipos_nodo = np.concatenate([
+            np.zeros(n, dtype=np.int8),
+            np.asarray(cat_tipos, dtype=np.int8),
+        ])
+
+        return cls(
+            n_articulos=n,
+            tipos=tipos,
+            tipos_nodo=tipos_nodo,
+            categoria_ids=cat_ids,
+            categoria_etiquetas=cat_etiquetas,
+            indptr=indptr,
+            indices=destino[orden].astype(np.int32),
+            pesos=np.concatenate([w, w])[orden],
+            tipos_arista=np.concatenate([t, t])[orden],
+            formato_articulo=formato_articulo,
+            atributos_articulo=(
+                None if atributos_articulo is None
+                else lambda i: atributos_articulo(i, registros[i])
+            ),
+            atributos_categoria=atributos_categoria,
+        )
+
+    # ============================================
+    # CONSULTAS
+    # ============================================
+    def number_of_nodes(self):
+        return len(self.tipos_nodo)
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+    @property
+    def nbytes(self):
+        """Bytes de los arrays (sin contar los ids de categoría)."""
+        return sum(a.nbytes for a in (self.tipos_nodo, self.indptr, self.indices, self.pesos, self.tipos_arista))
+
+    def nodo_id(self, k):
+        if k < self.n_articulos:
+            return self.formato_articulo.format(k)
+        return self.categoria_ids[k - self.n_articulos]
+
+    def indice(self, node_id):
+        """Índice entero de un id de nodo (artículo o categoría)."""
+        k = self._indice_categoria.get(node_id)
+        if k is not None:
+            return k
+        prefijo = self.formato_articulo.format("")
+        if isinstance(node_id, str) and node_id.startswith(prefijo):
+            i = int(node_id[len(prefijo):])
+            if 0 <= i < self.n_articulos:
+                return i
+        raise KeyError(node_id)
+
+    def tipo(self, k):
+        return self.tipos[self.tipos_nodo[k]]
+
+    def grado(self):
+        return np.diff(self.indptr)
+
+    def vecinos(self, k, tipo_arista=None):
+        """(índices, pesos) de los vecinos del nodo k; vistas sobre el CSR."""
+        ini, fin = self.indptr[k], self.indptr[k + 1]
+        indices, pesos = self.indices[ini:fin], self.pesos[ini:fin]
+        if tipo_arista is None:
+            return indices, pesos
+        mask = self.tipos_arista[ini:fin] == tipo_arista
+        return indices[mask], pesos[mask]
+
+    def articulos_por_categoria(self, tipo):
+        """{etiqueta: índices de artículos} de las categorías de un tipo."""
+        if tipo not in self.tipos:
+            return {}
+        codigo = self.tipos.index(tipo)
+        n = self.n_articulos
+        resultado = {}
+        for k in np.flatnonzero(self.tipos_nodo[n:] == codigo):
+            resultado[self.categoria_etiquetas[k]] = self.vecinos(n + k, ARISTA_CATEGORIA)[0]
+        return resultado
+
+    def adyacencia(self, tipo_arista=None):
+        """Matriz scipy CSR (nodos × nodos) con los pesos de las aristas."""
+        from scipy import sparse
+
+        total = self.number_of_nodes()
+        if tipo_arista is None:
+            return sparse.csr_matrix((self.pesos, self.indices, self.indptr), shape=(total, total))
+
+        mask = self.tipos_arista == tipo_arista
+        filas = np.repeat(np.arange(total), self.grado())[mask]
+        return sparse.csr_matrix(
+            (self.pesos[mask], (filas, self.indices[mask])), shape=(total, total)
+        )
+
+    def similitud(self):
+        """Matriz dispersa artículo × artículo de las aristas de similitud."""
+        n = self.n_articulos
+        return self.adyacencia(ARISTA_SIMILITUD)[:n, :n]
+
+    def componentes(self):
+        """(número de componentes, etiqueta de componente por nodo)."""
+        from scipy.sparse.csgraph import connected_components
+
+        return connected_components(self.adyacencia(), directed=False)
+
+    # ============================================
+    # CONVERSIÓN (solo para pyvis / matplotlib)
+    # ============================================
+    def atributos(self, k):
+        """Atributos del nodo k (los mismos que tiene en to_networkx())."""
+        n = self.n_articulos
+        if k < n:
+            return self._atributos_articulo(k) if self._atributos_articulo else {"tipo": "articulo"}
+        etiqueta = self.categoria_etiquetas[k - n]
+        if self._atributos_categoria:
+            return self._atributos_categoria(self.tipo(k), etiqueta)
+        return {"tipo": self.tipo(k), "etiqueta": etiqueta}
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from((self.nodo_id(k), self.atributos(k)) for k in range(self.number_of_nodes()))
+
+        # Cada arista una sola vez (fila < columna)
+        filas = np.repeat(np.arange(self.number_of_nodes()), self.grado())
+        sup = filas < self.indices
+        filas, cols = filas[sup].tolist(), self.indices[sup].tolist()
+        pesos, tipos = self.pesos[sup].tolist(), self.tipos_arista[sup].tolist()
+
+        nodo = self.nodo_id
+        G.add_edges_from(
+            (nodo(u), nodo(v), {"tipo": "similitud", "peso": w} if t == ARISTA_SIMILITUD else {})
+            for u, v, w, t in zip(filas, cols, pesos, tipos)
+        )
+        return G
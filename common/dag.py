@@ -0,0 +1,285 @@
+"""
+Ejecutor de etapas con dependencias (DAG) y huellas de contenido.
+
+Cada Etapa declara los archivos o carpetas que lee (entradas) y los que
+escribe (salidas); las dependencias se deducen de ahí: una etapa depende
+de las que producen alguna de sus entradas. Antes de correr una etapa se
+calcula su huella (sha256 del contenido de las entradas + parámetros +
+config). Si coincide con la de la última corrida exitosa y las salidas
+siguen como quedaron, la etapa se omite.
+
+La huella incluye también el archivo fuente del módulo que define la
+función de la etapa: editar etapas.py repite sus etapas. El código de
+otros módulos que la etapa llame no entra; si importa, se declara en
+`codigo` (o forzar=True).
+
+El estado (huellas por etapa y una caché tamaño/mtime → hash de cada
+archivo, para no releer los que no cambiaron) se guarda en ESTADO_DAG_PATH.
+
+Las etapas cuyas dependencias ya terminaron corren a la vez en un pool de
+hilos.
+"""
+
+import os
+import json
+import time
+import inspect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from common.paths import ROOT_DIR
+
+ESTADO_DAG_PATH = os.path.join(ROOT_DIR, "data", "cache", "etapas.json")
+
+
+class Etapa:
+    def __init__(
+        self, nombre, funcion, entradas=(), salidas=(), parametros=None, config=None, despues=(), codigo=()
+    ):
+        """
+        funcion(**parametros) ejecuta la etapa. config: valores de los que
+        depende el resultado pero que no se pasan como argumento (modelo,
+        dtype, ...). despues: nombres de etapas que deben terminar antes,
+        además de las deducidas de entradas/salidas. codigo: archivos
+        fuente extra cuyo cambio debe repetir la etapa (el del módulo de
+        funcion se incluye siempre).
+        """
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = [os.path.abspath(p) for p in entradas]
+        self.salidas = [os.path.abspath(p) for p in salidas]
+        self.parametros = dict(parametros or {})
+        self.config = dict(config or {})
+        self.despues = list(despues)
+        self.codigo = [os.path.abspath(p) for p in (_fuente(funcion), *codigo) if p]
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r})"
+
+
+# ============================================
+# HUELLAS
+# ============================================
+def _fuente(funcion):
+    """Archivo fuente donde se define funcion (None si no tiene, p. ej. builtins)."""
+    funcion = getattr(funcion, "func", funcion)  # functools.partial
+    try:
+        return inspect.getsourcefile(inspect.unwrap(funcion))
+    except TypeError:
+        return None
+
+
+def _hash_archivo(path, cache, bloque=1 << 20):
+    st = os.stat(path)
+    previo = cache.get(path)
+    if previo and previo[0] == st.st_size and previo[1] == st.st_mtime_ns:
+        return previo[2]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    cache[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+    return cache[path][2]
+
+
+def _hash_ruta(path, cache):
+    """Hash del contenido de un archivo o de todos los archivos de una carpeta."""
+    if os.path.isfile(path):
+        return _hash_archivo(path, cache)
+    if not os.path.isdir(path):
+        return "ausente"
+
+    h = hashlib.sha256()
+    for raiz, carpetas, archivos in os.walk(path):
+        carpetas.sort()
+        for nombre in sorted(archivos):
+            completo = os.path.join(raiz, nombre)
+            h.update(os.path.relpath(completo, path).encode("utf-8"))
+            h.update(_hash_archivo(completo, cache).encode("ascii"))
+    return h.hexdigest()
+
+
+def _huella_etapa(etapa, cache):
+    h = hashlib.sha256(etapa.nombre.encode("utf-8"))
+    h.update(json.dumps([etapa.parametros, etapa.config], sort_keys=True, default=repr).encode("utf-8"))
+    for path in etapa.entradas + etapa.codigo:
+        h.update(path.encode("utf-8"))
+        h.update(_hash_ruta(path, cache).encode("ascii"))
+    return h.hexdigest()
+
+
+def _huella_salidas(etapa, cache):
+    return [_hash_ruta(path, cache) for path in etapa.salidas]
+
+
+# ============================================
+# GRAFO DE ETAPAS
+# ============================================
+def dependencias(etapas):
+    """
+    (etapas en orden topológico, {nombre: nombres de los que depende}).
+    ValueError si hay nombres repetidos, salidas compartidas o ciclos.
+    """
+    por_nombre = {}
+    productor = {}
+    for e in etapas:
+        if e.nombre in por_nombre:
+            raise ValueError(f"Etapa repetida: {e.nombre}")
+        por_nombre[e.nombre] = e
+        for path in e.salidas:
+            if path in productor:
+                raise ValueError(f"{path} es salida de {productor[path]} y de {e.nombre}")
+            productor[path] = e.nombre
+
+    deps = {}
+    for e in etapas:
+        faltantes = [d for d in e.despues if d not in por_nombre]
+        if faltantes:
+            raise ValueError(f"{e.nombre} depende de etapas inexistentes: {faltantes}")
+        deps[e.nombre] = {productor[p] for p in e.entradas if p in productor} | set(e.despues)
+        deps[e.nombre].discard(e.nombre)
+
+    # Orden topológico (Kahn), estable respecto del orden declarado
+    orden, hechas = [], set()
+    while len(orden) < len(etapas):
+        listas = [e for e in etapas if e.nombre not in hechas and deps[e.nombre] <= hechas]
+        if not listas:
+            ciclo = sorted(set(por_nombre) - hechas)
+            raise ValueError(f"Las etapas forman un ciclo: {ciclo}")
+        orden.extend(listas)
+        hechas.update(e.nombre for e in listas)
+    return orden, deps
+
+
+def seleccionar(etapas, deps, desde=None, hasta=None):
+    """
+    Nombres de las etapas a considerar: `desde` y todo lo que depende de
+    ella; `hasta` y todo aquello de lo que depende; con ambos, la
+    intersección.
+    """
+    nombres = [e.nombre for e in etapas]
+    for n in (desde, hasta):
+        if n is not None and n not in nombres:
+            raise ValueError(f"Etapa desconocida: {n}. Opciones: {nombres}")
+
+    seleccion = set(nombres)
+    if desde is not None:
+        abajo = {desde}
+        for e in etapas:  # orden topológico: los ancestros ya se visitaron
+            if deps[e.nombre] & abajo:
+                abajo.add(e.nombre)
+        seleccion &= abajo
+    if hasta is not None:
+        arriba, pendientes = set(), [hasta]
+        while pendientes:
+            n = pendientes.pop()
+            if n not in arriba:
+                arriba.add(n)
+                pendientes.extend(deps[n])
+        seleccion &= arriba
+    return seleccion
+
+
+# ============================================
+# EJECUCIÓN
+# ============================================
+def _cargar_estado(path):
+    if not path or not os.path.exists(path):
+        return {"etapas": {}, "archivos": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_estado(path, estado):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _correr(etapa, previo, cache, forzar):
+    """(ejecutada, resultado, registro para el estado, caché de hashes)."""
+    huella = _huella_etapa(etapa, cache)
+    salidas_ok = all(os.path.exists(p) for p in etapa.salidas)
+
+    if (
+        not forzar
+        and salidas_ok
+        and previo is not None
+        and previo["huella"] == huella
+        and previo["salidas"] == _huella_salidas(etapa, cache)
+    ):
+        print(f"[CACHE] Etapa '{etapa.nombre}' sin cambios: se omite")
+        return False, None, previo, cache
+
+    print(f"[INFO] Etapa '{etapa.nombre}' en ejecución...")
+    inicio = time.time()
+    resultado = etapa.funcion(**etapa.parametros)
+    segundos = time.time() - inicio
+
+    faltantes = [p for p in etapa.salidas if not os.path.exists(p)]
+    if faltantes:
+        raise RuntimeError(f"La etapa '{etapa.nombre}' no generó: {faltantes}")
+
+    print(f"[OK] Etapa '{etapa.nombre}' terminada ({segundos:.2f} s)")
+    return True, resultado, {
+        "huella": huella,
+        "salidas": _huella_salidas(etapa, cache),
+        "segundos": round(segundos, 3),
+    }, cache
+
+
+def ejecutar(etapas, desde=None, hasta=None, forzar=False, max_workers=None, estado_path=ESTADO_DAG_PATH):
+    """
+    Ejecuta las etapas seleccionadas (ver seleccionar) respetando sus
+    dependencias; las que no dependen entre sí corren en paralelo, hasta
+    max_workers a la vez. Las etapas fuera de la selección no se ejecutan:
+    sus salidas se usan tal como están en disco.
+
+    Devuelve {nombre: valor devuelto} de las etapas que se ejecutaron.
+    Si una etapa falla no se lanzan más: se esperan (y registran) las que
+    estén corriendo y se propaga el error.
+    """
+    orden, deps = dependencias(etapas)
+    seleccion = seleccionar(orden, deps, desde, hasta)
+    estado = _cargar_estado(estado_path)
+    cache = estado["archivos"]
+
+    pendientes = [e for e in orden if e.nombre in seleccion]
+    hechas = {e.nombre for e in orden if e.nombre not in seleccion}
+    resultados = {}
+
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        en_curso = {}
+        while (pendientes and error is None) or en_curso:
+            # Tras un error no se lanzan más etapas; solo se esperan las que corren
+            if error is None:
+                for e in [e for e in pendientes if deps[e.nombre] <= hechas]:
+                    pendientes.remove(e)
+                    previo = estado["etapas"].get(e.nombre)
+                    # Cada hilo trabaja sobre su copia de la caché de hashes
+                    en_curso[pool.submit(_correr, e, previo, dict(cache), forzar)] = e
+
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                e = en_curso.pop(futuro)
+                try:
+                    ejecutada, resultado, registro, cache_etapa = futuro.result()
+                except BaseException as exc:
+                    error = error or exc
+                    continue
+
+                cache.update(cache_etapa)
+                estado["etapas"][e.nombre] = registro
+                _guardar_estado(estado_path, estado)
+                if ejecutada:
+                    resultados[e.nombre] = resultado
+                hechas.add(e.nombre)
+
+    if error is not None:
+        raise error
+    return resultados
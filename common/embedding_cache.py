@@ -0,0 +1,141 @@
+"""
+Caché en disco de embeddings compartida por los agentes QWEN y CFMS.
+
+La clave de cada vector es el SHA-256 del nombre del modelo y del texto
+final que se codifica. Se guardan los vectores crudos (sin normalizar);
+cada agente aplica su propia normalización después, así que un mismo
+texto nunca se vuelve a pasar por el encoder.
+
+Estructura por modelo (un subdirectorio por modelo):
+- meta.json     → nombre del modelo y dimensión
+- claves.txt    → un hash por línea, en el orden de las filas
+- vectores.f32  → matriz float32 (n × dim) en binario, solo se agrega al final
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from common.paths import ROOT_DIR
+
+EMBEDDING_CACHE_DIR = os.path.join(ROOT_DIR, "data", "cache", "embeddings")
+
+_caches = {}
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        slug = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(cache_dir, slug)
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self._claves_path = os.path.join(self.dir, "claves.txt")
+        self._vectores_path = os.path.join(self.dir, "vectores.f32")
+
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self._n = 0
+        self._indice = {}
+
+        os.makedirs(self.dir, exist_ok=True)
+        self._cargar()
+
+    def _cargar(self):
+        if not os.path.exists(self._meta_path):
+            return
+
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+
+        claves = []
+        if os.path.exists(self._claves_path):
+            with open(self._claves_path, "r", encoding="utf-8") as f:
+                claves = f.read().split()
+
+        bytes_vectores = 0
+        if os.path.exists(self._vectores_path):
+            bytes_vectores = os.path.getsize(self._vectores_path)
+        filas_vectores = bytes_vectores // (4 * self.dim)
+
+        # Una escritura interrumpida puede dejar más filas en un archivo que
+        # en el otro: se recortan ambos a la parte consistente.
+        self._n = min(len(claves), filas_vectores)
+        if len(claves) != self._n:
+            with open(self._claves_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{c}\n" for c in claves[:self._n])
+        if bytes_vectores != self._n * 4 * self.dim:
+            with open(self._vectores_path, "r+b") as f:
+                f.truncate(self._n * 4 * self.dim)
+
+        self._indice = {clave: fila for fila, clave in enumerate(claves[:self._n])}
+
+    def key(self, texto: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{texto}".encode("utf-8")).hexdigest()
+
+    def _agregar(self, claves, vectores):
+        if self.dim is None:
+            self.dim = int(vectores.shape[1])
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+
+        # Primero los vectores y después las claves: una clave nunca apunta
+        # a una fila que no existe
+        with open(self._vectores_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectores, dtype=np.float32).tobytes())
+        with open(self._claves_path, "a", encoding="utf-8") as f:
+            f.writelines(f"{c}\n" for c in claves)
+
+        for clave in claves:
+            self._indice[clave] = self._n
+            self._n += 1
+
+    def encode(self, textos, encode_fn):
+        """
+        Devuelve una matriz float32 (len(textos) × dim) en el orden de
+        `textos`. Solo los textos que no están en la caché (sin repetir) se
+        pasan a encode_fn, que debe devolver un vector por texto.
+        """
+        claves = [self.key(t) for t in textos]
+
+        faltantes = {}
+        for clave, texto in zip(claves, textos):
+            if clave not in self._indice:
+                faltantes.setdefault(clave, texto)
+
+        self.misses += len(faltantes)
+        self.hits += len(textos) - len(faltantes)
+
+        if faltantes:
+            nuevos = np.asarray(encode_fn(list(faltantes.values())), dtype=np.float32)
+            self._agregar(list(faltantes), nuevos)
+
+        if not textos:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        matriz = np.memmap(self._vectores_path, dtype=np.float32, mode="r", shape=(self._n, self.dim))
+        return np.asarray(matriz[[self._indice[c] for c in claves]])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "aciertos": self.hits,
+            "codificados": self.misses,
+            "tasa_aciertos": self.hits / total if total else 0.0,
+            "entradas": self._n,
+        }
+
+    def resumen(self) -> str:
+        s = self.stats()
+        return (
+            f"[CACHE EMB] aciertos: {s['aciertos']} | codificados: {s['codificados']} "
+            f"| tasa: {s['tasa_aciertos']:.1%} | entradas: {s['entradas']}"
+        )
+
+
+def get_embedding_cache(model_name, cache_dir=EMBEDDING_CACHE_DIR) -> EmbeddingCache:
+    """Una instancia por (modelo, directorio) en todo el proceso."""
+    clave = (model_name, cache_dir)
+    if clave not in _caches:
+        _caches[clave] = EmbeddingCache(model_name, cache_dir)
+    return _caches[clave]
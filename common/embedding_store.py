@@ -0,0 +1,204 @@
+"""
+Almacén en disco de embeddings por artículo, pensado para corpus grandes.
+
+Estructura del directorio:
+- meta.json     → dimensión, dtype y número de filas confirmadas
+- ids.jsonl     → un id_articulo por línea (fila i ↔ línea i)
+- vectores.bin  → matriz (n × dim) en binario, float32 o float16
+
+matrix() devuelve un np.memmap de solo lectura: varios procesos pueden
+abrir el mismo almacén sin copiar la matriz a su memoria. Los artículos
+nuevos se agregan al final; los ya presentes se sobrescriben en su fila,
+en el mismo archivo (ver upsert).
+"""
+
+import os
+import json
+import numpy as np
+
+DTYPES = ("float32", "float16")
+
+
+def as_float(embeddings):
+    """
+    Devuelve los embeddings tal cual si ya son float32/float64 (memmap
+    incluido, sin copia). float16 se convierte a float32 porque HDBSCAN,
+    UMAP y BLAS no operan en media precisión.
+    """
+    embeddings = np.asarray(embeddings)
+    if embeddings.dtype in (np.float32, np.float64):
+        return embeddings
+    return embeddings.astype(np.float32)
+
+
+def hash_por_bloques(h, x, dtype=None, bloque=8192):
+    """
+    Agrega a h (hashlib) los bytes de x en bloques de filas, convertidos a
+    dtype si se da. Mismo resultado que h.update(x.astype(dtype).tobytes())
+    pero sin copiar la matriz completa (ni materializar un memmap).
+    """
+    for i in range(0, len(x), bloque):
+        h.update(memoryview(np.ascontiguousarray(x[i:i + bloque], dtype=dtype)))
+    return h
+
+
+class EmbeddingStore:
+    def __init__(self, path, dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype no soportado: {dtype}. Opciones: {DTYPES}")
+
+        self.path = path
+        self._meta_path = os.path.join(path, "meta.json")
+        self._ids_path = os.path.join(path, "ids.jsonl")
+        self._vectores_path = os.path.join(path, "vectores.bin")
+
+        self.dim = None
+        self.dtype = np.dtype(dtype)
+        self._ids = []
+        self._indice = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._cargar()
+
+    @staticmethod
+    def _clave(id_articulo) -> str:
+        return str(id_articulo)
+
+    def _cargar(self):
+        if not os.path.exists(self._meta_path):
+            return
+
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if np.dtype(meta["dtype"]) != self.dtype:
+            raise ValueError(
+                f"El almacén {self.path} es {meta['dtype']}, no {self.dtype.name}: "
+                "usa el mismo dtype o regenera el almacén"
+            )
+        self.dim = meta["dim"]
+        n = meta["n"]
+
+        lineas = []
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, "r", encoding="utf-8") as f:
+                lineas = f.readlines()
+        bytes_fila = self.dim * self.dtype.itemsize
+        tam_vectores = os.path.getsize(self._vectores_path) if os.path.exists(self._vectores_path) else 0
+
+        # Si faltan ids o vectores (archivo borrado o copiado a medias) solo
+        # se conservan las filas completas en ambos
+        completas = min(n, len(lineas), tam_vectores // bytes_fila)
+        if completas < n:
+            print(
+                f"[ADVERTENCIA] Almacén de embeddings incompleto en {self.path}: "
+                f"{completas} de {n} filas recuperables"
+            )
+            n = completas
+        self._ids = [json.loads(linea) for linea in lineas[:n]]
+
+        # meta.json se escribe al final de cada agregado: lo que haya más
+        # allá de n en los otros archivos es de una escritura interrumpida
+        if len(lineas) > n:
+            with open(self._ids_path, "w", encoding="utf-8") as f:
+                f.writelines(lineas[:n])
+        if tam_vectores > n * bytes_fila:
+            with open(self._vectores_path, "r+b") as f:
+                f.truncate(n * bytes_fila)
+        if n < meta["n"]:
+            self._guardar_meta()
+
+        self._indice = {self._clave(i): fila for fila, i in enumerate(self._ids)}
+
+    def _guardar_meta(self):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "n": len(self._ids)}, f)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def ids(self):
+        return list(self._ids)
+
+    def __contains__(self, id_articulo):
+        return self._clave(id_articulo) in self._indice
+
+    def index_of(self, id_articulo) -> int:
+        return self._indice[self._clave(id_articulo)]
+
+    def matrix(self, mode="r"):
+        """Matriz completa como memmap (n × dim), sin cargarla en memoria."""
+        if not self._ids:
+            return np.zeros((0, self.dim or 0), dtype=self.dtype)
+        return np.memmap(self._vectores_path, dtype=self.dtype, mode=mode, shape=(len(self._ids), self.dim))
+
+    def upsert(self, ids, vectors):
+        """
+        Agrega los ids nuevos al final y sobrescribe en su fila los que ya
+        existen. Devuelve la fila de cada id, en el orden recibido.
+
+        Los ids nuevos se anexan a vectores.bin (meta.json se escribe al
+        final: una caída a mitad se descarta al cargar). Los existentes se
+        escriben en su lugar, y solo las filas cuyo vector cambió: las
+        vistas abiertas con matrix() o rows() ven el valor nuevo, y una
+        caída durante esa escritura puede dejar una fila mezclada (se
+        corrige volviendo a hacer upsert de esos ids).
+        """
+        vectors = np.asarray(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids y vectors deben tener la misma longitud")
+        if len(ids) == 0:
+            return []
+
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimensión {vectors.shape[1]} distinta a la del almacén ({self.dim})")
+
+        # Último vector por id (un id repetido en la misma llamada ocupa una fila)
+        posiciones = {}
+        for pos, id_articulo in enumerate(ids):
+            posiciones[self._clave(id_articulo)] = (pos, id_articulo)
+
+        existentes = [(self._indice[c], pos) for c, (pos, _) in posiciones.items() if c in self._indice]
+        nuevos = [(c, pos, i) for c, (pos, i) in posiciones.items() if c not in self._indice]
+
+        if existentes:
+            matriz = self.matrix(mode="r+")
+            filas, pos = (list(a) for a in zip(*existentes))
+            valores = vectors[pos].astype(self.dtype)
+            # Volver a guardar el mismo corpus no reescribe nada
+            cambian = np.any(matriz[filas] != valores, axis=1)
+            if cambian.any():
+                matriz[np.asarray(filas)[cambian]] = valores[cambian]
+                matriz.flush()
+            del matriz
+
+        if nuevos:
+            bloque = vectors[[pos for _, pos, _ in nuevos]].astype(self.dtype)
+            with open(self._vectores_path, "ab") as f:
+                f.write(np.ascontiguousarray(bloque).tobytes())
+            with open(self._ids_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(i, ensure_ascii=False) + "\n" for _, _, i in nuevos)
+
+            for clave, _, id_articulo in nuevos:
+                self._indice[clave] = len(self._ids)
+                self._ids.append(id_articulo)
+
+            self._guardar_meta()
+
+        return [self._indice[self._clave(i)] for i in ids]
+
+    def rows(self, ids):
+        """
+        Embeddings de `ids` en ese orden. Si ocupan un rango contiguo y
+        ordenado del almacén (el caso normal) se devuelve una vista del
+        memmap, sin copia; si no, una copia con solo esas filas.
+        """
+        filas = [self.index_of(i) for i in ids]
+        matriz = self.matrix()
+
+        if filas and filas == list(range(filas[0], filas[0] + len(filas))):
+            return matriz[filas[0]:filas[0] + len(filas)]
+        return np.asarray(matriz[filas])
@@ -0,0 +1,179 @@
+"""
+Layout 2-D de un CompactGraph para los gráficos del grafo.
+
+Fruchterman–Reingold con la repulsión aproximada por una rejilla
+(Barnes–Hut de un nivel): cada nodo se repele de los centroides de las
+celdas, ponderados por cuántos nodos tienen, en lugar de todos los demás
+nodos. Costo por iteración O(N · celdas + aristas) en vez de O(N²).
+
+- Semillas: las coordenadas UMAP de los artículos (proyeccion_2d) dan la
+  posición inicial; las categorías empiezan en el centro de sus artículos.
+- Persistencia: las posiciones se guardan por id de nodo en `path`. Si el
+  grafo no cambió se devuelven tal cual; si cambió, los nodos conocidos
+  conservan su posición y solo se acomodan los nuevos.
+"""
+
+import os
+import hashlib
+import numpy as np
+
+
+def _huella(ids, grafo):
+    h = hashlib.sha256("\n".join(ids).encode("utf-8"))
+    # Sin copias: memoryview de los arrays CSR (ya contiguos)
+    h.update(memoryview(np.ascontiguousarray(grafo.indptr)))
+    h.update(memoryview(np.ascontiguousarray(grafo.indices)))
+    return h.hexdigest()
+
+
+def _cargar(path):
+    if not path or not os.path.exists(path):
+        return None
+    datos = np.load(path, allow_pickle=False)
+    return {
+        "ids": datos["ids"].tolist(),
+        "pos": datos["pos"],
+        "huella": str(datos["huella"]),
+    }
+
+
+def _guardar(path, ids, pos, huella):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, ids=np.asarray(ids), pos=pos, huella=np.asarray(huella))
+    os.replace(tmp, path)
+
+
+def _a_caja(x):
+    """Escala coordenadas al cuadrado [0, 1] × [0, 1] conservando proporciones."""
+    x = np.asarray(x, dtype=np.float64)
+    minimo = x.min(axis=0)
+    rango = max(float((x.max(axis=0) - minimo).max()), 1e-12)
+    return (x - minimo) / rango
+
+
+def _repulsion(pos, k, moviles, celdas_lado, bloque=2048):
+    """Repulsión k² / d sobre los nodos móviles desde los centroides de una rejilla."""
+    n = len(pos)
+    minimo = pos.min(axis=0)
+    lado = max(float((pos.max(axis=0) - minimo).max()), 1e-12)
+
+    celda_xy = np.minimum(((pos - minimo) / lado * celdas_lado).astype(np.int64), celdas_lado - 1)
+    celda = celda_xy[:, 0] * celdas_lado + celda_xy[:, 1]
+    n_celdas = celdas_lado * celdas_lado
+
+    masa = np.bincount(celda, minlength=n_celdas).astype(np.float64)
+    sumas = np.stack([
+        np.bincount(celda, weights=pos[:, 0], minlength=n_celdas),
+        np.bincount(celda, weights=pos[:, 1], minlength=n_celdas),
+    ], axis=1)
+    ocupadas = np.flatnonzero(masa)
+    centro = sumas[ocupadas] / masa[ocupadas, None]
+    masa_ocupada = masa[ocupadas]
+    indice_ocupada = np.full(n_celdas, -1)
+    indice_ocupada[ocupadas] = np.arange(len(ocupadas))
+
+    fuerza = np.zeros_like(pos)
+    k2 = k * k
+    for inicio in range(0, len(moviles), bloque):
+        i = moviles[inicio:inicio + bloque]
+        p = pos[i]
+        delta = p[:, None, :] - centro[None, :, :]
+        d2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+        f = (k2 * masa_ocupada[None, :] / d2)[:, :, None] * delta
+
+        # La celda propia: sin el propio nodo en el centroide
+        propia = indice_ocupada[celda[i]]
+        filas = np.arange(len(i))
+        f_propia = f[filas, propia]
+        m_resto = masa_ocupada[propia] - 1
+        con_resto = m_resto > 0
+        centro_resto = np.where(
+            con_resto[:, None],
+            (centro[propia] * masa_ocupada[propia, None] - p) / np.maximum(m_resto, 1)[:, None],
+            p,
+        )
+        delta_resto = p - centro_resto
+        d2_resto = np.maximum((delta_resto ** 2).sum(axis=1), 1e-9)
+        f_resto = (k2 * m_resto / d2_resto)[:, None] * delta_resto
+
+        fuerza[i] = f.sum(axis=1) - f_propia + np.where(con_resto[:, None], f_resto, 0)
+
+    return fuerza
+
+
+def layout_grafo(grafo, semillas=None, path=None, iteraciones=50, seed=42, celdas_lado=None):
+    """
+    Posiciones (N × 2, en [0, 1]) de los nodos de un CompactGraph, en el
+    orden de sus índices.
+
+    semillas: coordenadas 2-D iniciales de los artículos (n_articulos × 2),
+    p. ej. las de proyeccion_2d. path: archivo .npz donde se guardan las
+    posiciones por id de nodo entre corridas.
+    """
+    n = grafo.number_of_nodes()
+    ids = [grafo.nodo_id(k) for k in range(n)]
+    huella = _huella(ids, grafo)
+
+    previo = _cargar(path)
+    if previo is not None and previo["huella"] == huella:
+        print(f"[CACHE] Layout del grafo reutilizado ({n} nodos)")
+        return previo["pos"]
+
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    conocido = np.zeros(n, dtype=bool)
+
+    if previo is not None:
+        posicion = {nid: k for k, nid in enumerate(previo["ids"])}
+        previas = np.array([posicion.get(nid, -1) for nid in ids])
+        conocido = previas >= 0
+        pos[conocido] = previo["pos"][previas[conocido]]
+    elif semillas is not None and grafo.n_articulos:
+        pos[:grafo.n_articulos] = _a_caja(semillas) + 0.01 * rng.standard_normal((grafo.n_articulos, 2))
+        conocido[:grafo.n_articulos] = True
+
+    # Nodos sin posición: al centro de sus vecinos que ya la tienen
+    filas = np.repeat(np.arange(n), grafo.grado())
+    cols = grafo.indices
+    vecino_conocido = conocido[cols]
+    cuenta = np.bincount(filas[vecino_conocido], minlength=n)
+    for eje in range(2):
+        suma = np.bincount(filas[vecino_conocido], weights=pos[cols[vecino_conocido], eje], minlength=n)
+        ubicables = ~conocido & (cuenta > 0)
+        pos[ubicables, eje] = suma[ubicables] / cuenta[ubicables]
+    pos[~conocido] += 0.01 * rng.standard_normal((int((~conocido).sum()), 2))
+
+    # Con posiciones guardadas, los nodos conocidos quedan fijos
+    fijos = conocido if previo is not None else np.zeros(n, dtype=bool)
+    moviles = np.flatnonzero(~fijos)
+
+    if len(moviles) and n > 1:
+        k = 1.0 / np.sqrt(n)
+        celdas_lado = celdas_lado or int(np.clip(np.sqrt(n) / 2, 4, 40))
+        pesos = grafo.pesos.astype(np.float64)
+        # Con semillas el layout inicial ya es bueno: se enfría desde más abajo
+        temperatura = 0.1 if not conocido.any() else 0.03
+        enfriamiento = temperatura / (iteraciones + 1)
+
+        for _ in range(iteraciones):
+            fuerza = _repulsion(pos, k, moviles, celdas_lado)
+
+            delta = pos[cols] - pos[filas]
+            dist = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+            atraccion = delta * (dist * pesos / k)[:, None]
+            fuerza[:, 0] += np.bincount(filas, weights=atraccion[:, 0], minlength=n)
+            fuerza[:, 1] += np.bincount(filas, weights=atraccion[:, 1], minlength=n)
+
+            largo = np.sqrt((fuerza[moviles] ** 2).sum(axis=1)) + 1e-9
+            pos[moviles] += fuerza[moviles] * (np.minimum(largo, temperatura) / largo)[:, None]
+            temperatura -= enfriamiento
+
+    if path:
+        _guardar(path, ids, pos, huella)
+    return pos
+
+
+def posiciones_por_id(grafo, pos):
+    """{id de nodo: (x, y)} para nx.draw / pyvis."""
+    return {grafo.nodo_id(k): (float(x), float(y)) for k, (x, y) in enumerate(pos)}
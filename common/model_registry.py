@@ -0,0 +1,82 @@
+"""
+Registro de modelos compartido por los agentes QWEN y CFMS.
+
+Cada modelo se carga la primera vez que se pide y se reutiliza una sola
+instancia por (tipo, modelo, dispositivo, precisión) en todo el proceso.
+release_models() permite soltar un modelo cuando ya no hace falta (por
+ejemplo el LLM al terminar la extracción) para que su memoria se libere
+antes de las etapas siguientes.
+"""
+
+import gc
+import threading
+
+_modelos = {}
+_lock = threading.Lock()
+
+
+def resolve_device(device=None):
+    if device:
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_model(kind, model_name, device=None, precision="float32", loader=None):
+    """
+    Devuelve el modelo registrado bajo (kind, model_name, device, precision).
+    Si todavía no está cargado se llama a loader() una sola vez.
+    """
+    clave = (kind, model_name, resolve_device(device), precision)
+
+    with _lock:
+        if clave not in _modelos:
+            if loader is None:
+                raise KeyError(f"Modelo no registrado y sin loader: {clave}")
+            _modelos[clave] = loader()
+        return _modelos[clave]
+
+
+def get_embedding_model(model_name, device=None):
+    """SentenceTransformer compartido (se importa y carga en el primer uso)."""
+    device = resolve_device(device)
+
+    def loader():
+        from sentence_transformers import SentenceTransformer
+        print(f"Cargando modelo de embeddings {model_name} en {device}...")
+        return SentenceTransformer(model_name, device=device)
+
+    return get_model("embeddings", model_name, device, loader=loader)
+
+
+def release_models(kind=None, model_name=None):
+    """
+    Quita del registro los modelos que coinciden con kind/model_name (None
+    = cualquiera) y libera su memoria. Solo se libera de verdad si nadie
+    más conserva una referencia al modelo.
+    """
+    with _lock:
+        claves = [
+            clave for clave in _modelos
+            if (kind is None or clave[0] == kind)
+            and (model_name is None or clave[1] == model_name)
+        ]
+        for clave in claves:
+            del _modelos[clave]
+
+    if not claves:
+        return []
+
+    gc.collect()
+
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+    print(f"[OK] Modelos liberados: {', '.join(f'{c[0]}:{c[1]}' for c in claves)}")
+    return claves
+
+
+def loaded_models():
+    with _lock:
+        return list(_modelos)
@@ -0,0 +1,6 @@
+"""Rutas compartidas por los agentes QWEN y CFMS."""
+
+import os
+
+# Raíz del repositorio
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -1,53 +1,189 @@
 """
-Pipeline completo:
-1. Ejecuta extractor QWEN (estructura + embeddings + grafo HTML)
-2. Copia JSON al agente CFMS
-3. Ejecuta agente CFMS (clustering + grafos + taxonomía)
-4. Genera visualizaciones y reporte final + PDF
+Pipeline completo, como DAG de etapas (common.dag):
+1. extraccion      → QWEN: estructura + embeddings + grafo HTML
+2. copia           → JSON al agente CFMS
+3. embeddings      → embeddings CFMS
+4. similitud / clustering (en paralelo)
+5. taxonomia / visualizaciones (en paralelo)
+6. reporte         → reporte clínico + PDF
+
+Cada etapa se omite si sus entradas (por contenido) y su configuración
+no cambiaron desde la última corrida: cambiar un parámetro de HDBSCAN
+repite clustering, taxonomía, visualizaciones y reporte, no la extracción.
+
+Con en_memoria=True (--en-memoria) no se usa el DAG: run_qwen entrega
+registros y embeddings directamente a agente_cfms.main, sin pasar por el
+JSON ni su copia; con persistir=False (--sin-persistir) tampoco se
+escriben el JSON, los almacenes de embeddings ni el índice ANN.
+
+Uso:
+    python pipeline.py                          # lo que haga falta
+    python pipeline.py --from clustering        # clustering y lo que sigue
+    python pipeline.py --until taxonomia        # hasta la taxonomía
+    python pipeline.py --from reporte --force   # repetir solo el PDF
+    python pipeline.py --en-memoria             # corrida completa, sin DAG
+    python pipeline.py --en-memoria --reutilizar-embeddings
+                                                # ... sin re-embeber en CFMS
 """
 
+import os
+import json
+import shutil
+import time
+
+from qwen import config as qwen_config
 from qwen.run_qwen import run_qwen
+from agente_cfms import etapas as cfms
 from agente_cfms.main import main as run_cfms
 from agente_cfms.reports.reporter import generar_reporte
 from agente_cfms.reports.pdf_report import generar_reporte_pdf
-import time
+from agente_cfms.embeddings.semantic_extractor import EMBEDDING_MODEL, EMBEDDINGS_DTYPE
+from common.dag import Etapa, ejecutar
 
+# Configuración de QWEN que cambia el resultado de la extracción (no los
+# parámetros de rendimiento como BATCH_SIZE o NUM_WORKERS)
+CONFIG_EXTRACCION = (
+    "MODEL_NAME",
+    "PRECISION",
+    "EMBEDDING_MODEL",
+    "GENERATION_PARAMS",
+    "STOP_AT_JSON_END",
+    "SCHEMA_GUIDED_DECODING",
+    "GRAPH_EXPORT_MODE",
+    "GRAPH_MAX_ARISTAS_COMPLETO",
+    "GRAPH_TOP_K",
+    "GRAPH_AGRUPAR_CATEGORIAS",
+    "GRAPH_MIN_ARTICULOS_CATEGORIA",
+)
 
-def pipeline_completo():
-    print("\n====================================")
-    print("   🚀 PIPELINE QWEN → CFMS INICIADO")
-    print("====================================\n")
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(qwen_config.__file__)), "prompts.py")
 
-    inicio = time.time()
 
-    # =============================
-    # 1. EJECUTAR QWEN
-    # =============================
+def _copiar_json(origen, destino):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    shutil.copy(origen, destino)
+    print(f"[OK] JSON copiado a {destino}")
+
+
+def etapas_pipeline(modo_similitud="auto", top_k=30, sim_threshold=0.75, memoria_mb=256, clustering=None):
+    """
+    Etapas del pipeline QWEN → CFMS. clustering: parámetros de
+    agente_cfms.etapas.etapa_clustering (min_cluster_size, reduccion, ...).
+    """
+    es = cfms.ENTRADAS_SALIDAS
+
+    def etapa_cfms(nombre, funcion, parametros=None, config=None):
+        entradas, salidas = es[nombre]
+        return Etapa(nombre, funcion, entradas, salidas, parametros, config)
+
+    return [
+        Etapa(
+            "extraccion",
+            run_qwen,
+            entradas=[qwen_config.CSV_PATH, PROMPTS_PATH],
+            salidas=[qwen_config.OUTPUT_JSON_PATH, qwen_config.GRAPH_HTML_PATH],
+            # El LLM se libera al terminar la extracción: no ocupa memoria
+            # durante las etapas CFMS
+            parametros={"release_llm": True, "copiar_a_cfms": False},
+            config={k: getattr(qwen_config, k) for k in CONFIG_EXTRACCION},
+        ),
+        Etapa(
+            "copia",
+            _copiar_json,
+            entradas=[qwen_config.OUTPUT_JSON_PATH],
+            salidas=[cfms.ENTRADA_JSON_PATH],
+            parametros={"origen": qwen_config.OUTPUT_JSON_PATH, "destino": cfms.ENTRADA_JSON_PATH},
+        ),
+        etapa_cfms(
+            "embeddings",
+            cfms.etapa_embeddings,
+            config={"modelo": EMBEDDING_MODEL, "dtype": EMBEDDINGS_DTYPE},
+        ),
+        etapa_cfms(
+            "similitud",
+            cfms.etapa_similitud,
+            parametros={
+                "modo_similitud": modo_similitud,
+                "top_k": top_k,
+                "sim_threshold": sim_threshold,
+                "memoria_mb": memoria_mb,
+            },
+        ),
+        etapa_cfms("clustering", cfms.etapa_clustering, parametros=clustering),
+        etapa_cfms("taxonomia", cfms.etapa_taxonomia),
+        etapa_cfms("visualizaciones", cfms.etapa_visualizaciones),
+        etapa_cfms("reporte", cfms.etapa_reporte),
+    ]
+
+
+def _pipeline_en_memoria(persistir=True, reutilizar_embeddings_qwen=False, **parametros):
+    """
+    QWEN → CFMS en un solo proceso, pasando registros (y opcionalmente
+    embeddings) en memoria. Devuelve la taxonomía.
+
+    Los embeddings de QWEN no se reutilizan por defecto: QWEN embebe otro
+    texto (sin el título) y CFMS obtendría otros clusters que con sus
+    propios embeddings.
+    """
     print("\n[1] Ejecutando agente QWEN...")
-    registros = run_qwen()
+    registros, embeddings = run_qwen(release_llm=True, copiar_a_cfms=False, persistir=persistir)
 
-    # =============================
-    # 2. EJECUTAR AGENTE CFMS
-    # =============================
     print("\n[2] Ejecutando agente CFMS...")
-    taxonomia = run_cfms()
+    taxonomia = run_cfms(
+        registros=registros,
+        embeddings=embeddings if reutilizar_embeddings_qwen else None,
+        persistir=persistir,
+        **parametros,
+    )
 
-    # =============================
-    # 3. REPORTE CLÍNICO
-    # =============================
     print("\n[3] Generando reporte clínico...")
-    reporte_textual = generar_reporte(taxonomia)
+    generar_reporte_pdf(cfms.PDF_PATH, generar_reporte(taxonomia))
+    return taxonomia
 
-    # =============================
-    # 4. PDF DEL REPORTE
-    # =============================
-    ruta_pdf = "agente_cfms/output/reporte_clinico.pdf"
-    generar_reporte_pdf(ruta_pdf, reporte_textual)
+
+def pipeline_completo(
+    desde=None,
+    hasta=None,
+    forzar=False,
+    max_workers=None,
+    en_memoria=False,
+    persistir=True,
+    reutilizar_embeddings_qwen=False,
+    **parametros,
+):
+    """
+    Ejecuta el pipeline (o solo las etapas entre `desde` y `hasta`),
+    omitiendo las que no cambiaron salvo con forzar=True. parametros se
+    pasan a etapas_pipeline. Devuelve la taxonomía.
+
+    en_memoria=True: corrida completa sin DAG ni archivos intermedios de
+    entrega (ver _pipeline_en_memoria); persistir y
+    reutilizar_embeddings_qwen solo aplican en ese modo.
+    """
+    print("\n====================================")
+    print("   🚀 PIPELINE QWEN → CFMS INICIADO")
+    print("====================================\n")
+
+    inicio = time.time()
+
+    if en_memoria:
+        taxonomia = _pipeline_en_memoria(persistir, reutilizar_embeddings_qwen, **parametros)
+        ejecutadas = ["qwen", "cfms", "reporte"]
+    else:
+        resultados = ejecutar(
+            etapas_pipeline(**parametros), desde=desde, hasta=hasta, forzar=forzar, max_workers=max_workers
+        )
+        ejecutadas = list(resultados)
+        taxonomia = resultados.get("taxonomia")
+        if taxonomia is None and os.path.exists(cfms.TAXONOMIA_PATH):
+            with open(cfms.TAXONOMIA_PATH, "r", encoding="utf-8") as f:
+                taxonomia = json.load(f)
 
     fin = time.time()
 
     print("\n====================================")
     print("   ✅ PIPELINE COMPLETO FINALIZADO")
+    print(f"   Etapas ejecutadas: {', '.join(ejecutadas) or 'ninguna'}")
     print(f"   Tiempo total: {fin - inicio:.2f} segundos")
     print("====================================\n")
 
@@ -55,5 +191,27 @@ def pipeline_completo():
 
 
 if __name__ == "__main__":
-    pipeline_completo()
+    import argparse
+
+    nombres = [e.nombre for e in etapas_pipeline()]
+    parser = argparse.ArgumentParser(description="Pipeline QWEN → CFMS por etapas")
+    parser.add_argument("--from", dest="desde", choices=nombres, help="primera etapa a considerar")
+    parser.add_argument("--until", dest="hasta", choices=nombres, help="última etapa a considerar")
+    parser.add_argument("--force", dest="forzar", action="store_true", help="ejecutar aunque no haya cambios")
+    parser.add_argument("--workers", dest="max_workers", type=int, default=None, help="etapas en paralelo")
+    parser.add_argument("--en-memoria", action="store_true", help="QWEN → CFMS en memoria, sin DAG")
+    parser.add_argument("--sin-persistir", dest="persistir", action="store_false",
+                        help="con --en-memoria: no escribir JSON, embeddings ni índice")
+    parser.add_argument("--reutilizar-embeddings", dest="reutilizar_embeddings_qwen", action="store_true",
+                        help="con --en-memoria: CFMS usa los embeddings de QWEN en vez de recalcularlos")
+    args = parser.parse_args()
 
+    pipeline_completo(
+        desde=args.desde,
+        hasta=args.hasta,
+        forzar=args.forzar,
+        max_workers=args.max_workers,
+        en_memoria=args.en_memoria,
+        persistir=args.persistir,
+        reutilizar_embeddings_qwen=args.reutilizar_embeddings_qwen,
+    )
@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+from .config import CACHE_DIR, CACHE_MAX_ENTRIES
+
+
+class ExtractionCache:
+    """
+    Caché en disco de resultados de extracción, direccionada por contenido.
+
+    Cada entrada es un archivo JSON cuyo nombre es el hash SHA-256 de todo
+    lo que determina la salida del LLM (abstract, modelo, prompt y
+    parámetros de generación). El tamaño está acotado por max_entries:
+    al superarlo se eliminan las entradas usadas hace más tiempo (LRU por
+    fecha de modificación, que se actualiza en cada acierto) hasta quedar
+    en la fracción nivel_bajo de max_entries, para no recorrer la caché
+    en cada escritura.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES, nivel_bajo=0.9):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.nivel_bajo = nivel_bajo
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._n_entries = len(self._entradas())
+
+    @staticmethod
+    def make_key(*partes) -> str:
+        """Hash estable de cualquier combinación de valores serializables."""
+        payload = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entradas(self) -> list:
+        entradas = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json"):
+                    entradas.append(entry)
+        return entradas
+
+    def get(self, key: str):
+        path = self._path(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Marca la entrada como usada recientemente
+        os.utime(path)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: dict):
+        path = self._path(key)
+        nueva = not os.path.exists(path)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Nombre temporal por proceso: varios workers comparten la caché
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        if nueva:
+            self._n_entries += 1
+            if self._n_entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta nivel_bajo * max_entries."""
+        entradas = []
+        for entry in self._entradas():
+            try:
+                entradas.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Otro proceso la eliminó mientras se listaba
+                continue
+
+        entradas.sort()
+        objetivo = int(self.max_entries * self.nivel_bajo)
+        sobrantes = len(entradas) - objetivo
+
+        for _, path in entradas[:max(sobrantes, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        self._n_entries = min(len(entradas), objetivo)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "aciertos": self.hits,
+            "fallos": self.misses,
+            "tasa_aciertos": self.hits / total if total else 0.0,
+            "entradas": self._n_entries,
+        }
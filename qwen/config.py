@@ -5,6 +5,23 @@
 # Modelo LLM que usas para generar la estructura del artículo
 MODEL_NAME = "Qwen/Qwen2.5-3B-Instruct"
 
+# Precisión del LLM: "float32", "bfloat16" o "int8" (cuantización dinámica
+# de las capas lineales, solo CPU). Verificar con: python -m qwen.precision
+PRECISION = "float32"
+
+# Número de abstracts que se envían juntos en cada llamada a generate.
+# Los lotes se arman ordenando por longitud para minimizar el padding.
+# Con 1 se procesa artículo por artículo en el orden del CSV.
+BATCH_SIZE = 8
+
+# Extracción en paralelo: número de procesos, cada uno con su propia copia
+# del modelo. Con 1 se usa un solo proceso (sin pool).
+NUM_WORKERS = 1
+
+# Hilos de torch por proceso. None reparte los núcleos disponibles
+# en partes iguales entre los NUM_WORKERS procesos.
+THREADS_PER_WORKER = None
+
 # Modelo de embeddings (Sentence Transformers)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
@@ -14,6 +31,60 @@ CSV_PATH = "data/articulos_cfm.csv"
 # Archivo donde se guardará el JSON estructurado con el output de QWEN
 OUTPUT_JSON_PATH = "data/articulos_estructurados.json"
 
+# Checkpoint JSONL de la extracción: cada registro se agrega apenas se genera,
+# permite retomar una corrida interrumpida sin perder lo ya procesado
+CHECKPOINT_PATH = "data/articulos_estructurados.checkpoint.jsonl"
+
+# Almacén en disco (memmap) de los embeddings QWEN, indexado por id_articulo
+EMBEDDINGS_STORE_PATH = "data/embeddings_qwen"
+
+# "float32" o "float16"
+EMBEDDINGS_DTYPE = "float32"
+
 # Ruta donde se almacenará el grafo HTML interactivo generado por pyvis
 GRAPH_HTML_PATH = "data/grafo_taxonomia.html"
 
+# Exportación del grafo: "completo" (pyvis con física en el navegador),
+# "escalable" (posiciones precalculadas, sin física, datos en un archivo
+# aparte) o "auto" (escalable a partir de GRAPH_MAX_ARISTAS_COMPLETO aristas)
+GRAPH_EXPORT_MODE = "auto"
+GRAPH_MAX_ARISTAS_COMPLETO = 2000
+
+# Modo escalable: aristas de similitud que se conservan por artículo y
+# agrupación de las categorías con menos de GRAPH_MIN_ARTICULOS_CATEGORIA
+# artículos en un nodo "otras" por tipo
+GRAPH_TOP_K = 10
+GRAPH_AGRUPAR_CATEGORIAS = False
+GRAPH_MIN_ARTICULOS_CATEGORIA = 2
+
+# Posiciones del grafo guardadas entre corridas (common.layout)
+GRAPH_LAYOUT_PATH = "data/layout_grafo_qwen.npz"
+
+# Proyección UMAP 2-D de los embeddings QWEN: semillas del layout escalable
+GRAPH_PROYECCION_PATH = "data/proyeccion_umap_qwen"
+
+
+# Parámetros de generación del LLM (también forman parte de la clave de caché)
+GENERATION_PARAMS = {
+    "max_new_tokens": 512,
+    "temperature": 0.0,
+    "do_sample": False,
+}
+
+# Corta la generación en cuanto se cierra el primer objeto JSON de nivel superior
+STOP_AT_JSON_END = True
+
+# Decodificación guiada por esquema: en el objeto raíz solo se permiten
+# las claves que pide el prompt (más lento por paso, menos JSON inválidos)
+SCHEMA_GUIDED_DECODING = False
+
+# Reutiliza el KV cache del prefijo fijo del prompt (instrucciones + esquema)
+# en lugar de recalcularlo para cada abstract
+REUSE_PREFIX_CACHE = True
+
+# Caché en disco de extracciones: evita volver a pasar por el LLM
+# los abstracts que ya se procesaron con el mismo modelo, prompt y parámetros
+CACHE_DIR = "data/cache/extraccion"
+
+# Máximo de entradas en la caché; al superarlo se eliminan las menos usadas
+CACHE_MAX_ENTRIES = 50000
@@ -0,0 +1,190 @@
+import torch
+from transformers import StoppingCriteria, LogitsProcessor
+from .prompts import SCHEMA_KEYS
+
+
+class _EstadoJSON:
+    """
+    Autómata mínimo sobre el texto generado: pila de contenedores,
+    estado de string/escape y la clave que se está escribiendo en el
+    objeto raíz. El texto previo al primer "{" se ignora.
+    """
+
+    def __init__(self):
+        self.pila = []
+        self.en_string = False
+        self.escape = False
+        self.esperando_clave = False
+        self.en_clave = False
+        self.clave = ""
+        self.claves_usadas = set()
+        self.terminado = False
+
+    def consumir(self, texto: str):
+        for ch in texto:
+            if self.terminado:
+                return
+
+            if self.en_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.en_string = False
+                    if self.en_clave:
+                        self.en_clave = False
+                        self.claves_usadas.add(self.clave)
+                elif self.en_clave:
+                    self.clave += ch
+                continue
+
+            if not self.pila:
+                if ch == "{":
+                    self.pila.append("{")
+                    self.esperando_clave = True
+                continue
+
+            if ch == '"':
+                self.en_string = True
+                if self.esperando_clave:
+                    self.esperando_clave = False
+                    self.en_clave = len(self.pila) == 1
+                    self.clave = ""
+            elif ch in "{[":
+                self.pila.append(ch)
+                self.esperando_clave = ch == "{"
+            elif ch in "}]":
+                self.pila.pop()
+                self.esperando_clave = False
+                if not self.pila:
+                    self.terminado = True
+            elif ch == ",":
+                self.esperando_clave = self.pila[-1] == "{"
+
+
+class SeguimientoJSON:
+    """
+    Estado JSON por fila de un batch de generate. Decodifica solo los
+    tokens nuevos desde la última llamada, por lo que puede compartirse
+    entre el criterio de parada y el procesador de logits.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.estados = [_EstadoJSON() for _ in range(batch_size)]
+        self._consumidos = 0
+
+    def actualizar(self, input_ids):
+        inicio = self.prompt_length + self._consumidos
+        nuevos = input_ids[:, inicio:].tolist()
+
+        for fila, estado in zip(nuevos, self.estados):
+            if not estado.terminado:
+                for token_id in fila:
+                    estado.consumir(self.tokenizer.decode([token_id]))
+
+        self._consumidos = input_ids.shape[1] - self.prompt_length
+
+
+class JsonObjectStoppingCriteria(StoppingCriteria):
+    """Detiene cada fila cuando se cierra su primer objeto JSON."""
+
+    def __init__(self, seguimiento: SeguimientoJSON):
+        self.seguimiento = seguimiento
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.seguimiento.actualizar(input_ids)
+        return torch.tensor(
+            [estado.terminado for estado in self.seguimiento.estados],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+class RestriccionClaves:
+    """
+    Vocabulario decodificado y tokens permitidos por contexto, para
+    limitar las claves del objeto raíz a SCHEMA_KEYS. Es costoso de
+    construir (decodifica todo el vocabulario) y se reutiliza entre
+    llamadas a generate; los conjuntos permitidos se memorizan.
+    """
+
+    def __init__(self, tokenizer, claves=SCHEMA_KEYS):
+        self.claves = tuple(claves)
+        self.vocab = [tokenizer.decode([i]) for i in range(len(tokenizer))]
+        self._memo = {}
+
+    @staticmethod
+    def _continua_clave(parcial: str, texto: str, restantes) -> bool:
+        s = parcial + texto
+        cierre = s.find('"')
+        if cierre >= 0:
+            return s[:cierre] in restantes
+        return any(clave.startswith(s) for clave in restantes)
+
+    def _permitido(self, contexto: str, parcial: str, texto: str, restantes) -> bool:
+        if contexto == "clave":
+            return self._continua_clave(parcial, texto, restantes)
+
+        # Antes de abrir la clave: espacios, comillas de apertura o cierre del objeto
+        resto = texto.lstrip(" \t\r\n")
+        if not resto:
+            return True
+        if resto[0] == "}":
+            return True
+        if resto[0] == '"':
+            return bool(restantes) and self._continua_clave("", resto[1:], restantes)
+        return False
+
+    def ids_permitidos(self, contexto: str, parcial: str, usadas) -> torch.Tensor:
+        restantes = frozenset(c for c in self.claves if c not in usadas)
+        memo_key = (contexto, parcial, restantes)
+
+        if memo_key not in self._memo:
+            self._memo[memo_key] = torch.tensor(
+                [
+                    i for i, texto in enumerate(self.vocab)
+                    if texto and self._permitido(contexto, parcial, texto, restantes)
+                ],
+                dtype=torch.long,
+            )
+
+        return self._memo[memo_key]
+
+
+class SchemaKeysLogitsProcessor(LogitsProcessor):
+    """
+    En el objeto raíz solo deja elegir tokens que escriben una de las
+    claves del esquema aún no usadas. Los valores no se restringen.
+    """
+
+    def __init__(self, seguimiento: SeguimientoJSON, restriccion: RestriccionClaves):
+        self.seguimiento = seguimiento
+        self.restriccion = restriccion
+
+    def __call__(self, input_ids, scores):
+        self.seguimiento.actualizar(input_ids)
+
+        for fila, estado in enumerate(self.seguimiento.estados):
+            if estado.terminado or (estado.en_string and not estado.en_clave):
+                continue
+
+            if estado.en_clave:
+                ids = self.restriccion.ids_permitidos("clave", estado.clave, estado.claves_usadas)
+            elif estado.esperando_clave and len(estado.pila) == 1:
+                ids = self.restriccion.ids_permitidos("inicio", "", estado.claves_usadas)
+            else:
+                continue
+
+            # Nunca dejar una fila sin opciones: sin candidatos no se restringe
+            if len(ids) == 0:
+                continue
+
+            ids = ids[ids < scores.shape[1]].to(scores.device)
+            mascara = torch.full_like(scores[fila], float("-inf"))
+            mascara[ids] = 0
+            scores[fila] = scores[fila] + mascara
+
+        return scores
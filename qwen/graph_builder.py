@@ -1,8 +1,9 @@
 import json
-import networkx as nx
+import numpy as np
 import torch
-from torch.nn.functional import cosine_similarity
+from torch.nn.functional import normalize
 from .config import OUTPUT_JSON_PATH
+from common.compact_graph import CompactGraph
 
 
 def normalize_key(value: str):
@@ -25,101 +26,101 @@ def load_registros(path=OUTPUT_JSON_PATH):
     return registros
 
 
-def build_graph(registros: list, embeddings, sim_threshold: float = 0.6):
-    G = nx.Graph()
-
-    # ==========================
-    # 1. NODOS DE ARTÍCULOS
-    # ==========================
-    for idx, reg in enumerate(registros):
-        node_id = f"articulo_{idx}"
-
-        G.add_node(
-            node_id,
-            tipo="articulo",
-            titulo=reg.get("titulo", ""),
-            arquitectura=reg.get("arquitectura_modelo"),
-            tarea=reg.get("tarea_principal"),
-            dominio=reg.get("dominio_medico"),
-            label=reg.get("titulo", f"Artículo {idx}"),
-            idx_embedding=idx,
-        )
-
-    # ==========================
-    # 2. NODOS DE CATEGORÍAS
-    # ==========================
-    for reg in registros:
-        # Arquitectura
-        if reg.get("arquitectura_modelo"):
-            key = normalize_key(reg["arquitectura_modelo"])
-            if key:
-                G.add_node(
-                    f"arch_{key}",
-                    tipo="arquitectura",
-                    etiqueta=reg["arquitectura_modelo"],
-                    label=f"Arquitectura: {reg['arquitectura_modelo']}",
-                )
-
-        # Tarea
-        if reg.get("tarea_principal"):
-            key = normalize_key(reg["tarea_principal"])
-            if key:
-                G.add_node(
-                    f"tarea_{key}",
-                    tipo="tarea",
-                    etiqueta=reg["tarea_principal"],
-                    label=f"Tarea: {reg['tarea_principal']}",
-                )
-
-        # Dominio
-        if reg.get("dominio_medico"):
-            key = normalize_key(reg["dominio_medico"])
-            if key:
-                G.add_node(
-                    f"dom_{key}",
-                    tipo="dominio",
-                    etiqueta=reg["dominio_medico"],
-                    label=f"Dominio: {reg['dominio_medico']}",
-                )
-
-    # ==========================
-    # 3. ARISTAS artículo → categoría
-    # ==========================
-    for idx, reg in enumerate(registros):
-        art_node = f"articulo_{idx}"
-
-        if reg.get("arquitectura_modelo"):
-            key = normalize_key(reg["arquitectura_modelo"])
-            G.add_edge(art_node, f"arch_{key}")
-
-        if reg.get("tarea_principal"):
-            key = normalize_key(reg["tarea_principal"])
-            G.add_edge(art_node, f"tarea_{key}")
-
-        if reg.get("dominio_medico"):
-            key = normalize_key(reg["dominio_medico"])
-            G.add_edge(art_node, f"dom_{key}")
-
-    # ==========================
-    # 4. ARISTAS DE SIMILITUD ENTRE ARTÍCULOS
-    # ==========================
+def similarity_edges(embeddings, sim_threshold: float = 0.6, block_size: int = 1024):
+    """
+    Pares con i < j y similitud coseno >= sim_threshold, como arrays
+    (filas int64, cols int64, sims float32).
+
+    Normaliza una sola vez y recorre el triángulo superior por bloques
+    (block_size × block_size) con productos matriciales; la selección
+    de pares se hace con operaciones de tensores y cada bloque aporta sus
+    arrays, que se concatenan una sola vez al final (sin objetos por par).
+    """
+    emb = normalize(torch.as_tensor(embeddings, dtype=torch.float32), dim=1)
+    n = emb.shape[0]
+    filas_out, cols_out, sims_out = [], [], []
+
+    for i in range(0, n, block_size):
+        filas = emb[i:i + block_size]
+        for j in range(i, n, block_size):
+            sims = filas @ emb[j:j + block_size].T
+
+            mask = sims >= sim_threshold
+            if i == j:
+                # Bloque diagonal: solo el triángulo superior estricto
+                mask = torch.triu(mask, diagonal=1)
+
+            ii, jj = mask.nonzero(as_tuple=True)
+            if len(ii) == 0:
+                continue
+
+            filas_out.append((ii + i).numpy())
+            cols_out.append((jj + j).numpy())
+            sims_out.append(sims[ii, jj].numpy())
+
+    if not filas_out:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    return np.concatenate(filas_out), np.concatenate(cols_out), np.concatenate(sims_out)
+
+
+def _categorias_registro(reg):
+    """(tipo, node_id, etiqueta) de las categorías de un registro."""
+    for campo, tipo, prefijo in (
+        ("arquitectura_modelo", "arquitectura", "arch"),
+        ("tarea_principal", "tarea", "tarea"),
+        ("dominio_medico", "dominio", "dom"),
+    ):
+        valor = reg.get(campo)
+        if valor:
+            yield tipo, f"{prefijo}_{normalize_key(valor)}", valor
+
+
+def _atributos_articulo(idx, reg):
+    return {
+        "tipo": "articulo",
+        "titulo": reg.get("titulo", ""),
+        "arquitectura": reg.get("arquitectura_modelo"),
+        "tarea": reg.get("tarea_principal"),
+        "dominio": reg.get("dominio_medico"),
+        "label": reg.get("titulo", f"Artículo {idx}"),
+        "idx_embedding": idx,
+    }
+
+
+def _atributos_categoria(tipo, etiqueta):
+    return {
+        "tipo": tipo,
+        "etiqueta": etiqueta,
+        "label": f"{tipo.capitalize()}: {etiqueta}",
+    }
+
+
+GRAPH_FORMATS = ("networkx", "compacto")
+
+
+def build_graph(registros: list, embeddings, sim_threshold: float = 0.6, formato: str = "networkx"):
+    """
+    Grafo artículo–categoría–artículo.
+
+    Nodos articulo_{idx}, arch_/tarea_/dom_{clave}; las aristas de
+    similitud salen de similarity_edges. Por defecto devuelve un
+    networkx.Graph, como antes; con formato="compacto" devuelve el
+    CompactGraph (arrays CSR), que visualize_graph acepta directamente
+    y G.to_networkx() convierte cuando hace falta.
+    """
+    if formato not in GRAPH_FORMATS:
+        raise ValueError(f"Formato de grafo no soportado: {formato}. Opciones: {GRAPH_FORMATS}")
+
+    pares = None
     if embeddings is not None:
-        emb = embeddings
-        n = len(registros)
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                sim = cosine_similarity(
-                    emb[i].unsqueeze(0), emb[j].unsqueeze(0)
-                ).item()
-
-                if sim >= sim_threshold:
-                    G.add_edge(
-                        f"articulo_{i}",
-                        f"articulo_{j}",
-                        tipo="similitud",
-                        peso=sim,
-                    )
-
-    return G
-
+        pares = similarity_edges(embeddings[:len(registros)], sim_threshold)
+
+    G = CompactGraph.desde_registros(
+        registros,
+        _categorias_registro,
+        pares,
+        formato_articulo="articulo_{}",
+        atributos_articulo=_atributos_articulo,
+        atributos_categoria=_atributos_categoria,
+    )
+    return G.to_networkx() if formato == "networkx" else G
@@ -0,0 +1,116 @@
+import re
+import json
+
+_DECODER = json.JSONDecoder()
+
+# Dentro de un bloque solo importan las llaves y los strings completos
+_ESTRUCTURA = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]|"', re.DOTALL)
+
+
+def _bloque_cercado(text: str):
+    """
+    Primer bloque ```json ... ``` cuyo contenido es un objeto JSON válido,
+    o None. Con find en lugar de una regex no codiciosa: muchas aperturas
+    sin cierre no vuelven a recorrer el resto del texto cada una.
+    """
+    minusculas = text.lower()
+    pos = 0
+    while True:
+        inicio = minusculas.find("```json", pos)
+        if inicio < 0:
+            return None
+        inicio += len("```json")
+        fin = text.find("```", inicio)
+        if fin < 0:
+            return None
+        try:
+            obj = json.loads(text[inicio:fin].strip())
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict):
+            return obj
+        pos = fin + 3
+
+
+def _arbol_llaves(text: str) -> list:
+    """
+    Una sola pasada sobre el texto: empareja llaves con una pila y devuelve
+    los bloques {...} balanceados como árbol (inicio, fin, hijos). Dentro de
+    un bloque se saltan strings completos (con escapes), así que las llaves
+    dentro de strings no cuentan; fuera de un bloque solo se busca la
+    siguiente "{". Los hijos de una llave que nunca se cierra suben al
+    nivel superior.
+    """
+    raices = []
+    pila = []  # (inicio, hijos)
+    pos = 0
+
+    while True:
+        if not pila:
+            inicio = text.find("{", pos)
+            if inicio < 0:
+                break
+            pila.append((inicio, []))
+            pos = inicio + 1
+            continue
+
+        m = _ESTRUCTURA.search(text, pos)
+        if m is None:
+            break
+        pos = m.end()
+        token = m.group()
+
+        if token == "{":
+            pila.append((m.start(), []))
+        elif token == "}":
+            inicio, hijos = pila.pop()
+            nodo = (inicio, pos, hijos)
+            (pila[-1][1] if pila else raices).append(nodo)
+        elif token == '"':
+            # String sin cerrar: ya no puede haber más bloques completos
+            break
+
+    # Llaves sin cerrar: sus bloques internos completos siguen siendo candidatos
+    for _, hijos in pila:
+        raices.extend(hijos)
+    raices.sort(key=lambda nodo: nodo[0])
+
+    return raices
+
+
+def extract_json_object(text: str, mode: str = "largest"):
+    """
+    Devuelve el objeto JSON (dict) encontrado en el texto, o None.
+
+    Si hay un bloque ```json válido se devuelve ese (el primero), aunque
+    haya objetos más grandes fuera de él: p. ej. un ejemplo antes de la
+    respuesta. Si no, se buscan bloques {...} en todo el texto:
+    mode="largest" elige el bloque válido más largo y mode="first" el
+    primero en el texto. Cada bloque se decodifica una sola vez con
+    raw_decode; solo si un bloque no es válido se prueban sus bloques
+    internos. El costo es O(n · profundidad) y soporta cualquier nivel
+    de anidamiento.
+    """
+    cercado = _bloque_cercado(text)
+    if cercado is not None:
+        return cercado
+
+    mejor = None
+    mejor_largo = -1
+    pendientes = list(reversed(_arbol_llaves(text)))
+
+    while pendientes:
+        inicio, fin, hijos = pendientes.pop()
+
+        try:
+            obj, _ = _DECODER.raw_decode(text, inicio)
+        except ValueError:
+            pendientes.extend(reversed(hijos))
+            continue
+
+        if mode == "first":
+            return obj
+        if fin - inicio > mejor_largo:
+            mejor, mejor_largo = obj, fin - inicio
+
+    return mejor
@@ -0,0 +1,122 @@
+import os
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from .config import (
+    OUTPUT_JSON_PATH,
+    CHECKPOINT_PATH,
+    BATCH_SIZE,
+    NUM_WORKERS,
+    THREADS_PER_WORKER,
+)
+
+# Agente propio de cada proceso worker (se crea en _init_worker)
+_agent = None
+
+
+def _init_worker(threads_per_worker):
+    """Carga el modelo una sola vez por worker con su presupuesto de hilos."""
+    global _agent
+
+    import torch
+    from .semantic_extractor import GenerativeTaxonomyAgent
+
+    torch.set_num_threads(threads_per_worker)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Solo se puede fijar antes del primer trabajo paralelo de torch
+        pass
+
+    _agent = GenerativeTaxonomyAgent(device="cpu")
+
+
+def _procesar_shard(inicio, fin, df_shard, batch_size, checkpoint_path):
+    checkpoint = f"{checkpoint_path}.shard{inicio}-{fin}" if checkpoint_path else None
+    registros = _agent.process_corpus(
+        df_shard,
+        batch_size=batch_size,
+        checkpoint_path=checkpoint,
+        output_path=None,
+    )
+    return registros, checkpoint
+
+
+def _rangos_shards(n_filas, n_shards):
+    """Divide [0, n_filas) en n_shards rangos contiguos de tamaño similar."""
+    base, resto = divmod(n_filas, n_shards)
+    rangos = []
+    inicio = 0
+    for k in range(n_shards):
+        fin = inicio + base + (1 if k < resto else 0)
+        rangos.append((inicio, fin))
+        inicio = fin
+    return rangos
+
+
+def process_corpus_parallel(
+    df,
+    num_workers=NUM_WORKERS,
+    threads_per_worker=THREADS_PER_WORKER,
+    batch_size=BATCH_SIZE,
+    output_path=OUTPUT_JSON_PATH,
+    checkpoint_path=CHECKPOINT_PATH,
+):
+    """
+    Reparte las filas del CSV entre num_workers procesos. Cada proceso
+    carga su propio modelo y usa threads_per_worker hilos de torch.
+
+    Los shards son rangos contiguos de filas y los resultados se unen en
+    el orden de los shards, así que el JSON final sigue el orden del CSV
+    sin importar qué worker termine primero. Cada shard escribe su propio
+    checkpoint, por lo que una corrida interrumpida se retoma igual que en
+    modo de un solo proceso (con el mismo número de workers). Los
+    checkpoints de los shards se eliminan una vez unidos los resultados;
+    con checkpoint_path=None no se escriben.
+    """
+    from .semantic_extractor import GenerativeTaxonomyAgent
+
+    # Antes de repartir: un id repetido en dos shards no lo detectaría ninguno
+    GenerativeTaxonomyAgent.validar_ids(df)
+
+    num_workers = max(1, min(num_workers, len(df)))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+
+    print(
+        f"Procesando {len(df)} artículos con {num_workers} procesos "
+        f"({threads_per_worker} hilos por proceso)..."
+    )
+
+    rangos = _rangos_shards(len(df), num_workers)
+
+    # spawn: cada worker arranca limpio, sin heredar el estado de torch del padre
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads_per_worker,),
+    ) as pool:
+        futuros = [
+            pool.submit(_procesar_shard, inicio, fin, df.iloc[inicio:fin], batch_size, checkpoint_path)
+            for inicio, fin in rangos
+        ]
+        resultados = [futuro.result() for futuro in futuros]
+
+    registros = []
+    for registros_shard, _ in resultados:
+        registros.extend(registros_shard)
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(registros, f, ensure_ascii=False, indent=4)
+
+        print(f"\nJSON generado en: {output_path}")
+
+    # Ya unidos, los checkpoints de los shards sobran: si quedaran, una
+    # corrida posterior los tomaría como artículos ya procesados
+    for _, checkpoint in resultados:
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    return registros
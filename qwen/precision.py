@@ -0,0 +1,117 @@
+"""
+Carga del LLM en distintas precisiones y verificación de que una
+precisión reducida no degrada la extracción.
+
+    python -m qwen.precision
+"""
+
+import torch
+from transformers import AutoModelForCausalLM
+from .config import MODEL_NAME, PRECISION, CSV_PATH
+from .prompts import SCHEMA_KEYS
+
+PRECISIONS = ("float32", "bfloat16", "int8")
+
+
+def load_causal_lm(model_name=MODEL_NAME, precision=PRECISION, device="cpu"):
+    """
+    - float32: pesos completos (~12 GB para 3B parámetros).
+    - bfloat16: mitad de memoria; matmuls nativos en CPUs con AVX512-BF16/AMX.
+    - int8: cuantización dinámica de nn.Linear (pesos int8, activaciones
+      cuantizadas al vuelo); ~1/4 de memoria en las capas lineales.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisión no soportada: {precision}. Opciones: {PRECISIONS}")
+
+    if precision == "int8" and device != "cpu":
+        raise ValueError("La cuantización dinámica int8 solo está disponible en CPU")
+
+    dtype = torch.bfloat16 if precision == "bfloat16" else torch.float32
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=dtype)
+
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    return model.to(device).eval()
+
+
+def _normalizar_campo(valor):
+    """Forma comparable de un campo extraído (sin mayúsculas ni espacios extra)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, list):
+        return tuple(sorted(_normalizar_campo(v) for v in valor))
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _normalizar_campo(v)) for k, v in valor.items()))
+    return " ".join(str(valor).lower().split())
+
+
+def comparar_precisiones(
+    df=None,
+    modos=PRECISIONS,
+    muestra=20,
+    batch_size=4,
+    umbral=0.9,
+    seed=42,
+):
+    """
+    Extrae los mismos abstracts (muestra aleatoria fija del corpus) con cada
+    precisión y mide, campo por campo, la coincidencia con la primera
+    precisión de `modos`, que se toma como referencia.
+
+    Los modelos se cargan de a uno y sin caché de extracción. Devuelve
+    {modo: {campo: fracción de coincidencia}} e imprime un aviso para cada
+    campo por debajo de `umbral`.
+    """
+    from .semantic_extractor import GenerativeTaxonomyAgent
+
+    if df is None:
+        import pandas as pd
+        df = pd.read_csv(CSV_PATH)
+
+    filas = df.sample(n=min(muestra, len(df)), random_state=seed)
+    abstracts = list(filas["abstract"].fillna(""))
+
+    resultados = {}
+    for modo in modos:
+        print(f"\n[PRECISIÓN] Extrayendo {len(abstracts)} abstracts en {modo}...")
+        agent = GenerativeTaxonomyAgent(
+            device="cpu",
+            use_cache=False,
+            precision=modo,
+        )
+
+        salidas = []
+        for i in range(0, len(abstracts), batch_size):
+            salidas.extend(agent._generate_json_batch(abstracts[i:i + batch_size]))
+        resultados[modo] = salidas
+
+        agent.release_llm()
+        del agent
+
+    referencia = resultados[modos[0]]
+    resumen = {}
+
+    print(f"\n=== Coincidencia por campo vs {modos[0]} ===")
+    for modo in modos[1:]:
+        resumen[modo] = {}
+        for campo in SCHEMA_KEYS:
+            iguales = sum(
+                _normalizar_campo(ref.get(campo)) == _normalizar_campo(out.get(campo))
+                for ref, out in zip(referencia, resultados[modo])
+            )
+            resumen[modo][campo] = iguales / len(referencia) if referencia else 1.0
+
+        total = sum(resumen[modo].values()) / len(SCHEMA_KEYS)
+        print(f"\n{modo}: {total:.1%} promedio")
+        for campo, frac in resumen[modo].items():
+            aviso = "  ⚠ por debajo del umbral" if frac < umbral else ""
+            print(f"  - {campo:<26} {frac:.1%}{aviso}")
+
+    return resumen
+
+
+if __name__ == "__main__":
+    comparar_precisiones()
@@ -4,6 +4,25 @@ SYSTEM_PROMPT = (
     "Always return ONLY a valid JSON object."
 )
 
+# Bloque fijo con la estructura esperada. Va antes del abstract para que
+# SYSTEM_PROMPT + SCHEMA_PROMPT formen un prefijo común a todos los artículos
+# (su KV cache se calcula una sola vez por carga del modelo).
+SCHEMA_PROMPT = (
+    "Return ONLY valid JSON with this structure:\n"
+    "{\n"
+    "  \"arquitectura_modelo\": \"...\",\n"
+    "  \"tarea_principal\": \"...\",\n"
+    "  \"dominio_medico\": \"...\",\n"
+    "  \"tipo_datos\": \"...\",\n"
+    "  \"recursos_datos\": \"...\",\n"
+    "  \"limitaciones_reportadas\": [\"...\"],\n"
+    "  \"comentarios_relevantes\": \"...\"\n"
+    "}\n"
+)
+
+# Parte variable del prompt, siempre al final
+ABSTRACT_TEMPLATE = "\nAbstract:\n{abstract}\n\nJSON:\n"
+
 USER_PROMPT_TEMPLATE = """
 Extract the following fields from the abstract:
 
@@ -21,3 +40,14 @@ Abstract:
 Return ONLY JSON.
 """
 
+
+# Claves que el extractor pide al modelo (en el orden del prompt)
+SCHEMA_KEYS = (
+    "arquitectura_modelo",
+    "tarea_principal",
+    "dominio_medico",
+    "tipo_datos",
+    "recursos_datos",
+    "limitaciones_reportadas",
+    "comentarios_relevantes",
+)
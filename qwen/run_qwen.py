@@ -1,13 +1,38 @@
 import os
-import json
 import shutil
 from .semantic_extractor import GenerativeTaxonomyAgent
+from .parallel import process_corpus_parallel
 from .graph_builder import build_graph
-from .visualize_graph import visualize_graph
-from .config import CSV_PATH, OUTPUT_JSON_PATH, GRAPH_HTML_PATH
-
-
-def run_qwen():
+from .visualize_graph import visualize_graph, usa_exportacion_escalable
+from .config import (
+    CSV_PATH,
+    OUTPUT_JSON_PATH,
+    CHECKPOINT_PATH,
+    GRAPH_HTML_PATH,
+    NUM_WORKERS,
+    EMBEDDINGS_STORE_PATH,
+    EMBEDDINGS_DTYPE,
+    GRAPH_PROYECCION_PATH,
+)
+from common.embedding_store import EmbeddingStore
+from agente_cfms.analytics.proyeccion import proyeccion_2d
+
+
+def run_qwen(release_llm=True, copiar_a_cfms=True, persistir=True):
+    """
+    Ejecuta el agente QWEN completo. Con release_llm=True el LLM se libera
+    apenas termina la extracción: embeddings, grafo y las etapas CFMS
+    posteriores ya no lo necesitan.
+
+    Devuelve (registros, embeddings), con los embeddings como array numpy
+    float32 (fila i ↔ registros[i]), para pasarlos en memoria al agente
+    CFMS (agente_cfms.main.main(registros=..., embeddings=...)).
+
+    copiar_a_cfms=False deja el JSON solo en OUTPUT_JSON_PATH (el DAG de
+    pipeline.py lo copia en su propia etapa). persistir=False no escribe
+    nada intermedio: ni checkpoint ni JSON, ni almacén de embeddings, ni
+    copia; solo el grafo HTML.
+    """
 
     # ========================
     # Validación del CSV
@@ -15,6 +40,8 @@ def run_qwen():
     if not os.path.exists(CSV_PATH):
         raise FileNotFoundError(f"No se encontró el archivo CSV en: {CSV_PATH}")
 
+    # Los modelos se cargan en su primer uso; en modo paralelo
+    # solo los workers cargan el LLM
     agent = GenerativeTaxonomyAgent()
 
     # ========================
@@ -25,44 +52,63 @@ def run_qwen():
     # ========================
     # 2. Estructurar info con Qwen 2.5
     # ========================
-    registros = agent.process_corpus(df)
+    salida_json = OUTPUT_JSON_PATH if persistir else None
+    if NUM_WORKERS > 1:
+        registros = process_corpus_parallel(
+            df,
+            output_path=salida_json,
+            checkpoint_path=CHECKPOINT_PATH if persistir else None,
+        )
+    elif persistir:
+        registros = agent.process_corpus(df)
+    else:
+        registros = agent.process_corpus(df, checkpoint_path=None, output_path=None)
+
+    if release_llm:
+        agent.release_llm()
 
     # ========================
     # 3. Embeddings
     # ========================
     embeddings = agent.compute_embeddings(registros)
+    matriz = embeddings.cpu().numpy()
+
+    if persistir:
+        store = EmbeddingStore(EMBEDDINGS_STORE_PATH, dtype=EMBEDDINGS_DTYPE)
+        store.upsert([r.get("id_articulo") for r in registros], matriz)
+        print(f"[OK] Embeddings guardados en: {EMBEDDINGS_STORE_PATH} ({len(store)} artículos)")
 
     # ========================
     # 4. Construcción del grafo
     # ========================
-    G = build_graph(registros, embeddings, sim_threshold=0.6)
+    G = build_graph(registros, embeddings, sim_threshold=0.6, formato="compacto")
 
     # ========================
     # 5. Grafo interactivo HTML
     # ========================
-    visualize_graph(G, output_path=GRAPH_HTML_PATH)
-
-    # ========================
-    # 6. Guardar JSON del extractor
-    # ========================
-    with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(registros, f, indent=4, ensure_ascii=False)
-
-    print(f"[OK] JSON creado en: {OUTPUT_JSON_PATH}")
+    # El layout escalable parte de la proyección UMAP de los embeddings
+    # (persistente: solo se re-ajusta si cambian); el modo completo no la usa
+    coords = None
+    if usa_exportacion_escalable(G):
+        coords = proyeccion_2d(
+            matriz, ids=[r.get("id_articulo") for r in registros], path=GRAPH_PROYECCION_PATH
+        )
+    visualize_graph(G, output_path=GRAPH_HTML_PATH, coords=coords)
 
     # ========================
-    # 7. Copiar JSON hacia CFMS
+    # 6. Copiar JSON hacia CFMS
     # ========================
-    os.makedirs("agente_cfms/data", exist_ok=True)
+    if copiar_a_cfms and persistir:
+        os.makedirs("agente_cfms/data", exist_ok=True)
 
-    shutil.copy(
-        OUTPUT_JSON_PATH,
-        "agente_cfms/data/articulos_estructurados.json"
-    )
+        shutil.copy(
+            OUTPUT_JSON_PATH,
+            "agente_cfms/data/articulos_estructurados.json"
+        )
 
-    print("[OK] JSON copiado a agente_cfms/data/articulos_estructurados.json")
+        print("[OK] JSON copiado a agente_cfms/data/articulos_estructurados.json")
 
-    return registros
+    return registros, matriz
 
 
 if __name__ == "__main__":
@@ -1,10 +1,37 @@
+import os
 import json
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+    AutoTokenizer,
+    StoppingCriteriaList,
+    LogitsProcessorList,
+)
 import torch
-from sentence_transformers import SentenceTransformer
-from .config import MODEL_NAME, EMBEDDING_MODEL, CSV_PATH, OUTPUT_JSON_PATH
-from .prompts import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
+from .config import (
+    MODEL_NAME,
+    EMBEDDING_MODEL,
+    CSV_PATH,
+    OUTPUT_JSON_PATH,
+    CHECKPOINT_PATH,
+    BATCH_SIZE,
+    GENERATION_PARAMS,
+    STOP_AT_JSON_END,
+    SCHEMA_GUIDED_DECODING,
+    REUSE_PREFIX_CACHE,
+    PRECISION,
+)
+from .prompts import SYSTEM_PROMPT, SCHEMA_PROMPT, ABSTRACT_TEMPLATE
+from .cache import ExtractionCache
+from .json_extract import extract_json_object
+from .precision import load_causal_lm
+from common.model_registry import get_model, get_embedding_model, release_models
+from common.embedding_cache import get_embedding_cache
+from .decoding import (
+    SeguimientoJSON,
+    JsonObjectStoppingCriteria,
+    RestriccionClaves,
+    SchemaKeysLogitsProcessor,
+)
 
 
 def normalizar_valor(v):
@@ -19,126 +46,407 @@ def normalizar_valor(v):
 
 
 class GenerativeTaxonomyAgent:
-    def __init__(self, device=None):
+    def __init__(
+        self,
+        device=None,
+        use_cache=True,
+        stop_at_json_end=STOP_AT_JSON_END,
+        schema_guided=SCHEMA_GUIDED_DECODING,
+        reuse_prefix_cache=REUSE_PREFIX_CACHE,
+        precision=PRECISION,
+    ):
+        """
+        Los modelos no se cargan aquí: el LLM, su tokenizer y el modelo de
+        embeddings se obtienen del registro compartido en su primer uso.
+        """
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-
-        print(f"Cargando modelo Qwen2.5 Instruct en {self.device}...")
-        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            MODEL_NAME,
-            torch_dtype=torch.float32,
-        ).to(self.device)
-
-        print("Cargando modelo de embeddings...")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL, device=self.device)
+        self.precision = precision
+        self.cache = ExtractionCache() if use_cache else None
+        self.stop_at_json_end = stop_at_json_end
+        self.schema_guided = schema_guided
+        self._restriccion_claves = None
+        self.reuse_prefix_cache = reuse_prefix_cache
+        self._prefix_ids = None
+        self._prefix_kv = None
+        self._tokenizer = None
+        self._model = None
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            # Padding a la izquierda: en modo batch todos los prompts terminan
+            # en la misma posición y la generación continúa justo después.
+            self._tokenizer.padding_side = "left"
+            if self._tokenizer.pad_token is None:
+                self._tokenizer.pad_token = self._tokenizer.eos_token
+        return self._tokenizer
+
+    @property
+    def model(self):
+        if self._model is None:
+            def loader():
+                print(f"Cargando modelo Qwen2.5 Instruct en {self.device} ({self.precision})...")
+                return load_causal_lm(MODEL_NAME, self.precision, self.device)
+
+            self._model = get_model("llm", MODEL_NAME, self.device, self.precision, loader)
+        return self._model
+
+    @property
+    def embedding_model(self):
+        return get_embedding_model(EMBEDDING_MODEL, device=self.device)
+
+    def release_llm(self):
+        """Suelta el LLM y su KV de prefijo; los embeddings siguen disponibles."""
+        self._model = None
+        self._prefix_ids = None
+        self._prefix_kv = None
+        release_models(kind="llm", model_name=MODEL_NAME)
 
     def load_articles(self, csv_path=CSV_PATH):
         df = pd.read_csv(csv_path)
         print(f"Se cargaron {len(df)} artículos desde {csv_path}")
         return df
 
-    def _build_prompt(self, abstract: str) -> str:
-        return (
-            f"{SYSTEM_PROMPT}\n\n"
-            f"Abstract:\n{abstract}\n\n"
-            "Return ONLY valid JSON with this structure:\n"
-            "{\n"
-            "  \"arquitectura_modelo\": \"...\",\n"
-            "  \"tarea_principal\": \"...\",\n"
-            "  \"dominio_medico\": \"...\",\n"
-            "  \"tipo_datos\": \"...\",\n"
-            "  \"recursos_datos\": \"...\",\n"
-            "  \"limitaciones_reportadas\": [\"...\"],\n"
-            "  \"comentarios_relevantes\": \"...\"\n"
-            "}\n"
-        )
+    @staticmethod
+    def _prompt_prefix() -> str:
+        """Instrucciones y esquema: idénticos para todos los artículos."""
+        return f"{SYSTEM_PROMPT}\n\n{SCHEMA_PROMPT}"
 
-    def _generate_json_from_abstract(self, abstract: str) -> dict:
-        prompt = self._build_prompt(abstract)
+    @staticmethod
+    def _prompt_suffix(abstract: str) -> str:
+        return ABSTRACT_TEMPLATE.format(abstract=abstract)
 
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+    def _build_prompt(self, abstract: str) -> str:
+        return self._prompt_prefix() + self._prompt_suffix(abstract)
+
+    def _prefix_cache(self):
+        """
+        Calcula una sola vez los past_key_values del prefijo fijo del prompt.
+        Se guardan en formato legacy (tupla por capa): generate crea tensores
+        nuevos al extender la caché, así que el prefijo nunca se modifica.
+        """
+        if self._prefix_kv is None:
+            self._prefix_ids = self.tokenizer(
+                self._prompt_prefix(), return_tensors="pt"
+            )["input_ids"].to(self.device)
+
+            with torch.no_grad():
+                out = self.model(self._prefix_ids, use_cache=True)
+
+            past = out.past_key_values
+            if hasattr(past, "to_legacy_cache"):
+                past = past.to_legacy_cache()
+            self._prefix_kv = past
+
+        return self._prefix_ids, self._prefix_kv
+
+    def _inputs_con_prefijo(self, abstracts: list) -> dict:
+        """
+        Entradas de generate reutilizando el KV del prefijo. El batch queda
+        como [prefijo][padding][abstract]: el padding intermedio va con
+        máscara 0, y las posiciones que generate deriva de la máscara
+        continúan justo después del prefijo.
+        """
+        prefix_ids, prefix_kv = self._prefix_cache()
+        batch = len(abstracts)
+
+        sufijos = self.tokenizer(
+            [self._prompt_suffix(abstract) for abstract in abstracts],
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False,
+        ).to(self.device)
 
-        outputs = self.model.generate(
-            **inputs,
-            max_new_tokens=512,
-            temperature=0.0,
-            do_sample=False
+        input_ids = torch.cat([prefix_ids.expand(batch, -1), sufijos["input_ids"]], dim=1)
+        attention_mask = torch.cat(
+            [torch.ones_like(prefix_ids).expand(batch, -1), sufijos["attention_mask"]],
+            dim=1,
+        )
+        past_key_values = tuple(
+            (k.expand(batch, -1, -1, -1), v.expand(batch, -1, -1, -1))
+            for k, v in prefix_kv
         )
 
-        decoded = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-        json_str = self._extract_json_block(decoded)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "past_key_values": past_key_values,
+        }
 
-        try:
-            data = json.loads(json_str)
-        except:
+    @staticmethod
+    def _estructura_vacia() -> dict:
+        return {
+            "arquitectura_modelo": None,
+            "tarea_principal": None,
+            "dominio_medico": None,
+            "tipo_datos": None,
+            "recursos_datos": None,
+            "limitaciones_reportadas": [],
+            "comentarios_relevantes": "",
+        }
+
+    def _parse_output(self, decoded: str) -> dict:
+        data = extract_json_object(decoded)
+
+        if data is None:
             print("⚠ JSON inválido. Usando estructura vacía.")
-            data = {
-                "arquitectura_modelo": None,
-                "tarea_principal": None,
-                "dominio_medico": None,
-                "tipo_datos": None,
-                "recursos_datos": None,
-                "limitaciones_reportadas": [],
-                "comentarios_relevantes": "",
-            }
+            data = self._estructura_vacia()
 
         return data
 
-    @staticmethod
-    def _extract_json_block(text: str) -> str:
-        """Extrae el bloque JSON más grande válido dentro del texto."""
-        import re
-        import json
-
-        # Buscar bloques tipo ```json { ... } ```
-        code_blocks = re.findall(r"```json(.*?)```", text, re.DOTALL | re.IGNORECASE)
-        for block in code_blocks:
-            try:
-                json.loads(block.strip())
-                return block.strip()
-            except:
-                pass
+    def _cache_key(self, abstract: str) -> str:
+        # "texto": la caché guarda la salida cruda del modelo (no el dict
+        # parseado); distingue las claves de las entradas en formato anterior.
+        # reuse_prefix_cache tokeniza prefijo y abstract por separado, lo que
+        # puede dar tokens distintos al prompt completo: va en la clave
+        return ExtractionCache.make_key(
+            "texto",
+            MODEL_NAME,
+            self._build_prompt(abstract),
+            GENERATION_PARAMS,
+            self.precision,
+            self.stop_at_json_end,
+            self.schema_guided,
+            self.reuse_prefix_cache,
+        )
 
-        # Buscar bloques {...}
-        brace_blocks = re.findall(r"\{(?:[^{}]|(?:\{[^{}]*\}))*\}", text, re.DOTALL)
+    def _controles_generacion(self, prompt_length: int, batch_size: int) -> dict:
+        """Criterio de parada y procesador de logits según la configuración."""
+        controles = {}
+
+        if not (self.stop_at_json_end or self.schema_guided):
+            return controles
+
+        seguimiento = SeguimientoJSON(self.tokenizer, prompt_length, batch_size)
+
+        if self.stop_at_json_end:
+            controles["stopping_criteria"] = StoppingCriteriaList(
+                [JsonObjectStoppingCriteria(seguimiento)]
+            )
+
+        if self.schema_guided:
+            if self._restriccion_claves is None:
+                self._restriccion_claves = RestriccionClaves(self.tokenizer)
+            controles["logits_processor"] = LogitsProcessorList(
+                [SchemaKeysLogitsProcessor(seguimiento, self._restriccion_claves)]
+            )
+
+        return controles
+
+    def _generate_json_batch(self, abstracts: list) -> list:
+        """
+        Genera la estructura JSON de varios abstracts con una sola llamada
+        a generate. Devuelve un dict por abstract, en el mismo orden.
+        Los abstracts ya presentes en la caché no pasan por el modelo.
+        """
+        resultados = [None] * len(abstracts)
+        pendientes = []
+
+        for pos, abstract in enumerate(abstracts):
+            entrada = self.cache.get(self._cache_key(abstract)) if self.cache is not None else None
+            if entrada is not None and "texto" in entrada:
+                # Se parsea al leer: un cambio en el parser aplica también a lo cacheado
+                resultados[pos] = self._parse_output(entrada["texto"])
+            else:
+                pendientes.append(pos)
+
+        if not pendientes:
+            return resultados
+
+        if self.reuse_prefix_cache:
+            inputs = self._inputs_con_prefijo([abstracts[pos] for pos in pendientes])
+        else:
+            prompts = [self._build_prompt(abstracts[pos]) for pos in pendientes]
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
 
-        valid = []
-        for block in brace_blocks:
-            try:
-                json.loads(block)
-                valid.append(block)
-            except:
-                pass
+        outputs = self.model.generate(
+            **inputs,
+            **GENERATION_PARAMS,
+            **self._controles_generacion(inputs["input_ids"].shape[1], len(pendientes)),
+            pad_token_id=self.tokenizer.pad_token_id,
+        )
 
-        if valid:
-            return max(valid, key=len)
+        # Solo se decodifican los tokens nuevos: el prompt incluye una
+        # plantilla JSON que no debe confundirse con la respuesta.
+        generados = outputs[:, inputs["input_ids"].shape[1]:]
+        decoded = self.tokenizer.batch_decode(generados, skip_special_tokens=True)
 
-        return "{}"
+        for pos, texto in zip(pendientes, decoded):
+            # La decodificación es greedy: el mismo prompt produce siempre
+            # el mismo texto, así que también se guardan los que no parsean.
+            if self.cache is not None:
+                self.cache.put(self._cache_key(abstracts[pos]), {"texto": texto})
+            resultados[pos] = self._parse_output(texto)
 
-    def process_corpus(self, df):
-        registros = []
+        return resultados
 
-        print(f"Procesando {len(df)} artículos...")
+    def _generate_json_from_abstract(self, abstract: str) -> dict:
+        return self._generate_json_batch([abstract])[0]
 
-        for _, row in df.iterrows():
-            titulo = row.get("titulo", "sin título")
-            abstract = row.get("abstract", "")
+    def _lotes_por_longitud(self, abstracts: list, batch_size: int) -> list:
+        """
+        Agrupa las posiciones de los abstracts en lotes de tamaño batch_size.
+        Los lotes se forman ordenando por longitud de la parte variable del
+        prompt tokenizada, así cada lote lleva el mínimo padding posible.
+        """
+        posiciones = list(range(len(abstracts)))
 
-            print(f"\nProcesando artículo: {titulo}")
+        if batch_size <= 1 or not abstracts:
+            return [[pos] for pos in posiciones]
 
-            info = self._generate_json_from_abstract(abstract)
+        sufijos = [self._prompt_suffix(abstract) for abstract in abstracts]
+        longitudes = [len(ids) for ids in self.tokenizer(sufijos)["input_ids"]]
+        posiciones.sort(key=lambda pos: longitudes[pos])
 
-            # === MUY IMPORTANTE: tus columnas reales ==
-            info["id_articulo"] = row.get("id_articulo", None)
-            info["titulo"] = titulo
+        return [
+            posiciones[i:i + batch_size]
+            for i in range(0, len(posiciones), batch_size)
+        ]
 
-            registros.append(info)
+    @staticmethod
+    def _clave_registro(id_articulo) -> str:
+        return str(id_articulo)
+
+    @classmethod
+    def validar_ids(cls, df):
+        """
+        ValueError si algún id_articulo falta o se repite: el checkpoint y
+        el armado final se indexan por id, y dos filas con la misma clave
+        terminarían compartiendo un solo registro.
+        """
+        if "id_articulo" not in df.columns:
+            raise ValueError("El CSV no tiene la columna id_articulo")
+
+        ids = df["id_articulo"]
+        faltantes = [int(pos) for pos in ids.index[ids.isna()]]
+        if faltantes:
+            raise ValueError(f"Filas sin id_articulo (índices del CSV): {faltantes[:10]}")
+
+        claves = ids.map(cls._clave_registro)
+        repetidos = sorted(claves[claves.duplicated()].unique())
+        if repetidos:
+            raise ValueError(f"id_articulo repetidos en el CSV: {repetidos[:10]}")
+
+    def _leer_checkpoint(self, checkpoint_path: str) -> dict:
+        """
+        Lee el checkpoint JSONL y devuelve {clave id_articulo: offset en bytes}.
+        Si la última línea quedó truncada por una caída, se recorta el archivo
+        para que las nuevas líneas se agreguen sobre un estado consistente.
+        """
+        offsets = {}
+
+        if not os.path.exists(checkpoint_path):
+            return offsets
+
+        with open(checkpoint_path, "rb+") as f:
+            offset = 0
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    f.truncate(offset)
+                    break
+                offsets[self._clave_registro(registro.get("id_articulo"))] = offset
+                offset += len(linea)
+
+        return offsets
+
+    def process_corpus(
+        self,
+        df,
+        batch_size=BATCH_SIZE,
+        checkpoint_path=CHECKPOINT_PATH,
+        output_path=OUTPUT_JSON_PATH,
+    ):
+        """
+        Extrae la estructura de todos los artículos del DataFrame.
+
+        Con checkpoint_path cada registro se agrega a un archivo JSONL en
+        cuanto se genera, así que los registros no se acumulan en memoria.
+        Si el proceso se interrumpe, la siguiente ejecución omite los
+        id_articulo ya presentes en el checkpoint (los lotes se procesan
+        ordenados por longitud, no por posición en el CSV). Al terminar, el
+        JSON final se arma desde el checkpoint en una sola pasada, en el
+        orden del CSV, y el checkpoint se elimina.
+
+        Con output_path=None no se escribe el JSON final y el checkpoint se
+        conserva. Requiere que id_articulo sea único dentro del CSV (ver
+        validar_ids).
+        """
+        self.validar_ids(df)
+        filas = [row for _, row in df.iterrows()]
+        claves = [self._clave_registro(row.get("id_articulo", None)) for row in filas]
+
+        offsets = self._leer_checkpoint(checkpoint_path) if checkpoint_path else {}
+        en_memoria = {}
+
+        pendientes = [pos for pos, clave in enumerate(claves) if clave not in offsets]
+        completados = len(filas) - len(pendientes)
+        if completados:
+            print(f"[CHECKPOINT] Retomando: {completados} artículos ya completados en {checkpoint_path}")
+
+        print(f"Procesando {len(pendientes)} artículos...")
+
+        abstracts = [filas[pos].get("abstract", "") for pos in pendientes]
+        checkpoint = open(checkpoint_path, "ab") if checkpoint_path else None
 
-        with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(registros, f, ensure_ascii=False, indent=2)
+        try:
+            for lote in self._lotes_por_longitud(abstracts, batch_size):
+                for i in lote:
+                    print(f"\nProcesando artículo: {filas[pendientes[i]].get('titulo', 'sin título')}")
+
+                infos = self._generate_json_batch([abstracts[i] for i in lote])
+
+                for i, info in zip(lote, infos):
+                    pos = pendientes[i]
+                    row = filas[pos]
+
+                    # === MUY IMPORTANTE: tus columnas reales ==
+                    info["id_articulo"] = row.get("id_articulo", None)
+                    info["titulo"] = row.get("titulo", "sin título")
+
+                    if checkpoint is None:
+                        en_memoria[claves[pos]] = info
+                        continue
+
+                    offsets[claves[pos]] = checkpoint.tell()
+                    checkpoint.write((json.dumps(info, ensure_ascii=False) + "\n").encode("utf-8"))
+
+                # Cada lote queda en disco antes de empezar el siguiente
+                if checkpoint is not None:
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        # Armado final en orden del CSV
+        if checkpoint_path:
+            registros = []
+            with open(checkpoint_path, "rb") as f:
+                for clave in claves:
+                    f.seek(offsets[clave])
+                    registros.append(json.loads(f.readline()))
+        else:
+            registros = [en_memoria[clave] for clave in claves]
+
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(registros, f, ensure_ascii=False, indent=4)
+
+            print(f"\nJSON generado en: {output_path}")
+
+            if checkpoint_path:
+                os.remove(checkpoint_path)
+
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(
+                f"[CACHE] aciertos: {stats['aciertos']} | fallos: {stats['fallos']} "
+                f"| tasa: {stats['tasa_aciertos']:.1%} | entradas: {stats['entradas']}"
+            )
 
-        print(f"\nJSON generado en: {OUTPUT_JSON_PATH}")
         return registros
 
     def compute_embeddings(self, registros):
@@ -157,7 +465,15 @@ class GenerativeTaxonomyAgent:
             partes_normalizadas = [normalizar_valor(p) for p in partes]
             textos.append(" | ".join(partes_normalizadas))
 
-        embeddings = self.embedding_model.encode(textos, convert_to_tensor=True)
+        # Solo los textos nuevos pasan por el encoder (y solo entonces se carga)
+        cache = get_embedding_cache(EMBEDDING_MODEL)
+        matriz = cache.encode(
+            textos,
+            lambda nuevos: self.embedding_model.encode(nuevos, convert_to_numpy=True),
+        )
+        print(cache.resumen())
+
+        embeddings = torch.from_numpy(matriz).to(self.device)
         print("Embeddings generados correctamente.")
         return embeddings
 
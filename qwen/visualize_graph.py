@@ -1,12 +1,54 @@
+import os
+import json
+import numpy as np
 from pyvis.network import Network
 import networkx as nx
-from .config import GRAPH_HTML_PATH
+from common.compact_graph import ARISTA_CATEGORIA, ARISTA_SIMILITUD
+from common.paths import ROOT_DIR
+from common.layout import layout_grafo
+from .config import (
+    GRAPH_HTML_PATH,
+    GRAPH_EXPORT_MODE,
+    GRAPH_MAX_ARISTAS_COMPLETO,
+    GRAPH_TOP_K,
+    GRAPH_AGRUPAR_CATEGORIAS,
+    GRAPH_MIN_ARTICULOS_CATEGORIA,
+    GRAPH_LAYOUT_PATH,
+)
 
+# Mismos colores / formas que el modo completo
+ESTILOS = {
+    "articulo": ("#1f77b4", "dot"),
+    "arquitectura": ("#2ca02c", "diamond"),
+    "tarea": ("#ff7f0e", "triangle"),
+    "dominio": ("#d62728", "square"),
+}
+ESTILO_OTRO = ("#7f7f7f", "dot")
 
-def visualize_graph(G: nx.Graph, output_path=GRAPH_HTML_PATH):
+VIS_DIR = os.path.join(ROOT_DIR, "lib", "vis-9.1.2")
+
+
+def usa_exportacion_escalable(G, modo=GRAPH_EXPORT_MODE):
+    """True si visualize_graph(G, modo=modo) delega en exportar_grafo_escalable."""
+    if isinstance(G, nx.Graph):
+        return False
+    return modo == "escalable" or (modo == "auto" and G.number_of_edges() > GRAPH_MAX_ARISTAS_COMPLETO)
+
+
+def visualize_graph(G, output_path=GRAPH_HTML_PATH, modo=GRAPH_EXPORT_MODE, coords=None):
     """
     Visualiza un grafo NetworkX con PyVis, usando labels y tooltips enriquecidos.
+    Acepta también el CompactGraph de build_graph(formato="compacto") (se convierte aquí).
+
+    modo="escalable" (o "auto" con más de GRAPH_MAX_ARISTAS_COMPLETO
+    aristas) delega en exportar_grafo_escalable; coords son semillas 2-D
+    opcionales para los artículos.
     """
+    if usa_exportacion_escalable(G, modo):
+        return exportar_grafo_escalable(G, output_path=output_path, coords=coords)
+    if not isinstance(G, nx.Graph):
+        G = G.to_networkx()
+
     net = Network(height="750px", width="100%", notebook=False, directed=False)
     net.toggle_physics(True)
 
@@ -73,3 +115,204 @@ def visualize_graph(G: nx.Graph, output_path=GRAPH_HTML_PATH):
     net.write_html(output_path)
     print(f"Grafo interactivo guardado en: {output_path}")
 
+
+
+# ==========================
+# MODO ESCALABLE
+# ==========================
+def _top_k_similitud(G, top_k):
+    """
+    Aristas de similitud (u < v) que están entre las top_k más pesadas de
+    al menos uno de sus extremos.
+    """
+    filas = np.repeat(np.arange(G.number_of_nodes()), G.grado())
+    sim = G.tipos_arista == ARISTA_SIMILITUD
+    u, v, w = filas[sim], G.indices[sim].astype(np.int64), G.pesos[sim]
+
+    # Dentro de cada fila, de mayor a menor peso
+    orden = np.lexsort((-w, u))
+    u, v, w = u[orden], v[orden], w[orden]
+    inicio_fila = np.searchsorted(u, u, side="left")
+    rango = np.arange(len(u)) - inicio_fila
+    elegidas = rango < top_k
+
+    a, b = np.minimum(u[elegidas], v[elegidas]), np.maximum(u[elegidas], v[elegidas])
+    _, unicas = np.unique(a * G.number_of_nodes() + b, return_index=True)
+    return a[unicas], b[unicas], w[elegidas][unicas]
+
+
+def _titulo(G, k):
+    atributos = G.atributos(k)
+    return atributos.get("label") or atributos.get("titulo") or G.nodo_id(k)
+
+
+def _datos_escalables(G, pos, top_k, agrupar_categorias, min_articulos):
+    n_art = G.n_articulos
+    total = G.number_of_nodes()
+    filas = np.repeat(np.arange(total), G.grado())
+
+    # Aristas artículo → categoría (u < v: u es el artículo)
+    cat = (G.tipos_arista == ARISTA_CATEGORIA) & (filas < G.indices)
+    cu, cv = filas[cat], G.indices[cat].astype(np.int64)
+
+    # Nodos de salida: artículos, categorías conservadas y, si se agrupan,
+    # un nodo "otras" por tipo con las categorías pequeñas
+    destino = np.arange(total)
+    ids = [G.nodo_id(k) for k in range(total)]
+    tipos = [G.tipo(k) for k in range(total)]
+    etiquetas = [""] * n_art + list(G.categoria_etiquetas)
+    x, y = list(pos[:, 0]), list(pos[:, 1])
+    conservados = np.ones(total, dtype=bool)
+
+    if agrupar_categorias:
+        articulos_por_cat = np.bincount(cv, minlength=total)
+        pequenas = np.arange(total) >= n_art
+        pequenas &= articulos_por_cat < min_articulos
+        for codigo in np.unique(G.tipos_nodo[pequenas]):
+            miembros = np.flatnonzero(pequenas & (G.tipos_nodo == codigo))
+            tipo = G.tipos[codigo]
+            destino[miembros] = len(ids)
+            ids.append(f"otras_{tipo}")
+            tipos.append(tipo)
+            etiquetas.append(f"Otras ({tipo}): {len(miembros)}")
+            x.append(float(pos[miembros, 0].mean()))
+            y.append(float(pos[miembros, 1].mean()))
+        conservados = np.concatenate([~pequenas, np.ones(len(ids) - total, dtype=bool)])
+
+    # Reindexado compacto de los nodos que quedan
+    nuevo = np.cumsum(conservados) - 1
+    cu, cv = nuevo[destino[cu]], nuevo[destino[cv]]
+    _, unicas = np.unique(cu * len(ids) + cv, return_index=True)
+    cu, cv = cu[unicas], cv[unicas]
+
+    su, sv, sw = _top_k_similitud(G, top_k)
+    su, sv = nuevo[su], nuevo[sv]
+
+    mantener = np.flatnonzero(conservados)
+    tipo_lista = sorted(set(tipos[k] for k in mantener))
+    codigo_tipo = {t: i for i, t in enumerate(tipo_lista)}
+
+    grado = np.bincount(np.concatenate([cu, cv, su, sv]), minlength=len(mantener))
+    escala = 60.0 * np.sqrt(len(mantener))
+
+    return {
+        "tipos": tipo_lista,
+        "estilos": {t: ESTILOS.get(t, ESTILO_OTRO) for t in tipo_lista},
+        "nodos": {
+            "id": [ids[k] for k in mantener],
+            "tipo": [codigo_tipo[tipos[k]] for k in mantener],
+            "etiqueta": [_titulo(G, k) if k < n_art else etiquetas[k] for k in mantener],
+            "x": np.round(np.asarray(x)[mantener] * escala, 1).tolist(),
+            "y": np.round(np.asarray(y)[mantener] * escala, 1).tolist(),
+            "grado": grado.tolist(),
+        },
+        "aristas": {
+            "de": np.concatenate([cu, su]).tolist(),
+            "a": np.concatenate([cv, sv]).tolist(),
+            "peso": [0] * len(cu) + np.round(sw, 3).tolist(),
+        },
+    }
+
+
+_PLANTILLA = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Grafo de taxonomía</title>
+<link rel="stylesheet" href="{vis}/vis-network.css">
+<script src="{vis}/vis-network.min.js"></script>
+<style>
+  html, body {{ margin: 0; height: 100%; font-family: sans-serif; }}
+  #grafo {{ width: 100%; height: 100%; }}
+  #estado {{ position: absolute; top: 8px; left: 8px; background: #fff; padding: 4px 8px; opacity: .85; }}
+</style>
+</head>
+<body>
+<div id="estado">Cargando grafo...</div>
+<div id="grafo"></div>
+<script>
+// Los datos se cargan después de la página desde {datos} (JSON envuelto en
+// cargarGrafo(...) para que funcione también abriendo el HTML como archivo)
+function cargarGrafo(d) {{
+  var N = d.nodos.id.length, nodos = new Array(N), aristas = new Array(d.aristas.de.length);
+  for (var i = 0; i < N; i++) {{
+    var tipo = d.tipos[d.nodos.tipo[i]], estilo = d.estilos[tipo], articulo = tipo === "articulo";
+    nodos[i] = {{
+      id: i, x: d.nodos.x[i], y: d.nodos.y[i], color: estilo[0], shape: estilo[1],
+      label: articulo ? undefined : d.nodos.etiqueta[i],
+      value: articulo ? 1 : d.nodos.grado[i]
+    }};
+  }}
+  for (var j = 0; j < aristas.length; j++) {{
+    aristas[j] = {{ from: d.aristas.de[j], to: d.aristas.a[j], width: d.aristas.peso[j] ? 1 : 0.5,
+                    color: {{ opacity: d.aristas.peso[j] ? 0.35 : 0.15 }} }};
+  }}
+  var red = new vis.Network(document.getElementById("grafo"),
+    {{ nodes: new vis.DataSet(nodos), edges: new vis.DataSet(aristas) }},
+    {{ physics: false, layout: {{ improvedLayout: false }},
+       edges: {{ smooth: false }}, nodes: {{ scaling: {{ min: 6, max: 40 }} }},
+       interaction: {{ hover: true, hideEdgesOnDrag: true, tooltipDelay: 150 }} }});
+
+  // Tooltip armado al pasar el cursor (no se guarda uno por nodo)
+  red.on("hoverNode", function (p) {{
+    var i = p.node, tipo = d.tipos[d.nodos.tipo[i]], texto = "<b>" + (d.nodos.etiqueta[i] || d.nodos.id[i]) + "</b>";
+    if (tipo === "articulo") {{
+      red.getConnectedNodes(i).forEach(function (k) {{
+        var t = d.tipos[d.nodos.tipo[k]];
+        if (t !== "articulo") texto += "<br><b>" + t + ":</b> " + d.nodos.etiqueta[k];
+      }});
+    }} else {{
+      texto += "<br><i>" + tipo + "</i> (" + d.nodos.grado[i] + " conexiones)";
+    }}
+    document.getElementById("estado").innerHTML = texto;
+  }});
+  document.getElementById("estado").innerHTML = N + " nodos, " + aristas.length + " aristas";
+}}
+window.addEventListener("load", function () {{
+  var s = document.createElement("script");
+  s.src = "{datos}";
+  document.body.appendChild(s);
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def exportar_grafo_escalable(
+    G,
+    output_path=GRAPH_HTML_PATH,
+    coords=None,
+    top_k=GRAPH_TOP_K,
+    agrupar_categorias=GRAPH_AGRUPAR_CATEGORIAS,
+    min_articulos=GRAPH_MIN_ARTICULOS_CATEGORIA,
+    layout_path=GRAPH_LAYOUT_PATH,
+):
+    """
+    Exporta un CompactGraph para grafos grandes:
+    - posiciones precalculadas con common.layout (física apagada en el navegador)
+    - solo las top_k aristas de similitud más fuertes de cada artículo
+    - opcionalmente, categorías pequeñas agrupadas en un nodo "otras" por tipo
+    - HTML mínimo que usa lib/vis-9.1.2 del repositorio y carga los datos
+      (arrays compactos en JSON) desde un archivo aparte, <html>.datos.js
+    """
+    pos = layout_grafo(G, semillas=coords, path=layout_path)
+    datos = _datos_escalables(G, pos, top_k, agrupar_categorias, min_articulos)
+
+    carpeta = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(carpeta, exist_ok=True)
+    datos_path = os.path.splitext(output_path)[0] + ".datos.js"
+
+    with open(datos_path, "w", encoding="utf-8") as f:
+        f.write("cargarGrafo(")
+        json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+        f.write(");\n")
+
+    vis = os.path.relpath(VIS_DIR, carpeta).replace(os.sep, "/")
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(_PLANTILLA.format(vis=vis, datos=os.path.basename(datos_path)))
+
+    print(
+        f"Grafo interactivo (escalable) guardado en: {output_path} "
+        f"({len(datos['nodos']['id'])} nodos, {len(datos['aristas']['de'])} aristas; datos en {datos_path})"
+    )